@@ -0,0 +1,306 @@
+import asyncio
+import contextvars
+import logging
+import math
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from langchain.agents.middleware import AgentMiddleware
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set constants
+MIN_CALL_BUDGET = 1.0
+RETRY_BASE_DELAY = 0.5
+RETRYABLE_ERRORS = {
+    # Anthropic SDK
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "OverloadedError",
+    # Bedrock / botocore
+    "ThrottlingException", "ServiceUnavailableException", "ModelNotReadyException",
+    "ReadTimeoutError", "ConnectTimeoutError", "EndpointConnectionError",
+    # Lambda (embedding function)
+    "TooManyRequestsException",
+}
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Server busy, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out before a stage starts."""
+
+
+class Deadline:
+    """Absolute time budget for one request, and the worker threads it started.
+
+    A request that runs out of time stops waiting for its threads, but they
+    keep running; `threads` counts them until they actually finish.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+        self.threads = 0
+        self._on_idle = []
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def thread_finished(self):
+        self.threads -= 1
+        if not self.threads:
+            callbacks, self._on_idle = self._on_idle, []
+            for callback in callbacks:
+                callback()
+
+    def when_idle(self, callback):
+        """Call `callback` once no worker thread of this request is running."""
+        if self.threads:
+            self._on_idle.append(callback)
+        else:
+            callback()
+
+
+@contextmanager
+def deadline_scope(deadline):
+    """Make `deadline` visible to everything the request runs, including worker threads."""
+    token = current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining_budget():
+    """Seconds left for the current request, or None outside a deadline."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def call_timeout(limit):
+    """Timeout for one outbound call: the remaining budget, at most `limit` seconds."""
+    remaining = remaining_budget()
+    return limit if remaining is None else max(min(limit, remaining), 0.1)
+
+
+def timeout_step(seconds):
+    """Round a timeout up to a 0.25 s step below 2 s, else a whole second.
+
+    Rounding up lets the request's own deadline answer 504 first; the call
+    then gives up at most one step later.
+    """
+    step = 0.25 if seconds < 2 else 1.0
+    return math.ceil(seconds / step) * step
+
+
+class BoundedClients:
+    """Clients with a fixed timeout, picked per call to fit the remaining budget.
+
+    botocore timeouts are set when a client is built, so `factory(timeout)`
+    builds one client per timeout step and each call takes the one for
+    call_timeout(limit).
+    """
+
+    def __init__(self, factory, limit):
+        self.factory = factory
+        self.limit = limit
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self):
+        timeout = min(timeout_step(call_timeout(self.limit)), self.limit)
+        with self._lock:
+            if timeout not in self._clients:
+                self._clients[timeout] = self.factory(timeout)
+            return self._clients[timeout]
+
+
+async def to_thread(fn, *args, **kwargs):
+    """asyncio.to_thread, counted against the current request's deadline.
+
+    Cancelling the caller (e.g. asyncio.wait_for timing out) does not stop
+    the thread; the request's Deadline keeps counting it until it returns so
+    admission can hold its slot until then.
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            return context.run(fn, *args, **kwargs)
+        finally:
+            loop.call_soon_threadsafe(deadline.thread_finished)
+
+    deadline.threads += 1
+    future = loop.run_in_executor(None, run)
+    # Nobody reads the result once the caller is cancelled
+    future.add_done_callback(lambda done: done.cancelled() or done.exception())
+    # Shielded so that a cancelled caller cannot drop `run` before it starts
+    return await asyncio.shield(future)
+
+
+def check_deadline(stage, needed=0.0):
+    """Fail fast if less than `needed` seconds remain before starting `stage`."""
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= needed:
+        metrics.increment(f"deadline.exceeded.{stage}")
+        raise DeadlineExceeded(f"No time left for {stage} ({remaining:.2f}s remaining)")
+
+
+def is_retryable(error):
+    """Whether error is a transient throttling, timeout or connection failure."""
+    code = getattr(error, "response", None)
+    if isinstance(code, dict):
+        code = code.get("Error", {}).get("Code")
+        if code in RETRYABLE_ERRORS:
+            return True
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+def _retry_delay(error, attempt, max_retries, stage):
+    """Backoff before retrying `error`, or None if it should be raised.
+
+    A retry is allowed only if the backoff plus MIN_CALL_BUDGET still fits
+    in the remaining budget.
+    """
+    if attempt >= max_retries or not is_retryable(error):
+        return None
+    delay = RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.0)
+    remaining = remaining_budget()
+    if remaining is not None and remaining < delay + MIN_CALL_BUDGET:
+        metrics.increment(f"deadline.retry_skipped.{stage}")
+        return None
+    metrics.increment(f"retries.{stage}")
+    logger.warning(f"Retrying {stage} after {type(error).__name__} (attempt {attempt + 1})")
+    return delay
+
+
+def call_with_retries(fn, *args, max_retries=2, stage="llm"):
+    """Call fn, retrying transient errors only while the deadline allows."""
+    attempt = 0
+    while True:
+        check_deadline(stage, MIN_CALL_BUDGET if attempt else 0.0)
+        try:
+            return fn(*args)
+        except Exception as e:
+            delay = _retry_delay(e, attempt, max_retries, stage)
+            if delay is None:
+                raise
+            attempt += 1
+            time.sleep(delay)
+
+
+class DeadlineMiddleware(AgentMiddleware):
+    """Apply the request deadline and budget-aware retries to agent model calls.
+
+    Each call is also limited to the remaining budget: with a `timeout`, for
+    models that take a per-call `timeout` setting (ChatAnthropic), and with
+    `bound_model`, a function returning the request's model with a client
+    that fits the budget (see BoundedClients).
+    """
+
+    def __init__(self, max_retries=2, timeout=None, bound_model=None):
+        super().__init__()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.bound_model = bound_model
+
+    def _bounded(self, request):
+        overrides = {}
+        if self.timeout is not None:
+            overrides["model_settings"] = {**request.model_settings,
+                                           "timeout": call_timeout(self.timeout)}
+        if self.bound_model is not None:
+            overrides["model"] = self.bound_model(request.model)
+        return request.override(**overrides) if overrides else request
+
+    def wrap_model_call(self, request, handler):
+        return call_with_retries(lambda: handler(self._bounded(request)),
+                                 max_retries=self.max_retries)
+
+    async def awrap_model_call(self, request, handler):
+        attempt = 0
+        while True:
+            check_deadline("llm", MIN_CALL_BUDGET if attempt else 0.0)
+            try:
+                return await handler(self._bounded(request))
+            except Exception as e:
+                delay = _retry_delay(e, attempt, self.max_retries, "llm")
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+
+class AdmissionController:
+    """Bound in-flight requests, with a bounded queue in front of them.
+
+    Up to `max_concurrency` requests run at once and up to `max_queue` more
+    wait, each for at most `queue_timeout` seconds (or its remaining
+    deadline). Anything beyond that is rejected immediately with Overloaded
+    so the caller can answer 503 instead of timing out later. A request that
+    timed out keeps its slot until its worker threads (see to_thread) finish.
+    """
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._service_time = 1.0
+
+    def retry_after(self):
+        """Seconds until a queued request would likely start, rounded up."""
+        backlog = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(backlog * self._service_time))
+
+    @asynccontextmanager
+    async def admit(self, deadline):
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue:
+            metrics.increment("admission.rejected")
+            raise Overloaded(self.retry_after())
+        else:
+            self.waiting += 1
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(),
+                                       min(self.queue_timeout, deadline.remaining()))
+            except asyncio.TimeoutError:
+                metrics.increment("admission.queue_timeout")
+                raise Overloaded(self.retry_after())
+            finally:
+                self.waiting -= 1
+            metrics.observe("admission.queue_wait", time.monotonic() - start)
+
+        self.active += 1
+        start = time.monotonic()
+
+        def release():
+            self.active -= 1
+            self._semaphore.release()
+            # Smoothed service time drives the Retry-After estimate
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - start)
+
+        try:
+            yield
+        finally:
+            if deadline.threads:
+                metrics.increment("admission.held_for_threads")
+            deadline.when_idle(release)
@@ -0,0 +1,452 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple, get_checkpoint_id
+from backend import metrics
+
+RETRIEVAL_TOOL = "retrieve_context"
+STALE_CONTEXT = "[Retrieved context omitted: the style guide index has changed since this turn.]"
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadState:
+    """Checkpoints of one (thread_id, checkpoint_ns) held in memory."""
+
+    def __init__(self):
+        self.tuples = {}
+        self.latest_id = None
+        self.durable_id = None
+        self.pending = None
+        self.writes = {}
+        self.owned_until = 0.0
+        # Held while the turn is written, so a turn is flushed once
+        self.flush_lock = threading.Lock()
+
+
+class WriteBehindCheckpointer(BaseCheckpointSaver):
+    """Checkpointer wrapper that caches hot threads and writes once per turn.
+
+    An agent turn reads the thread's latest checkpoint and then writes one
+    checkpoint (plus pending writes) per graph step. This wrapper keeps the
+    thread in a bounded in-process LRU, holds the per-step checkpoints in
+    memory and, on `flush`, writes only the latest one to the wrapped saver,
+    chained to the last checkpoint that was actually stored.
+
+    Reads are served from memory while a turn has unflushed checkpoints.
+    With `lease_seconds` > 0 the latest checkpoint is also kept for that long
+    after a read or flush, and reused only if the store's latest checkpoint
+    id still matches it. Before each flush the store's latest id is checked
+    the same way, and a turn whose thread another process wrote in the
+    meantime is dropped rather than written over it.
+
+    At most `max_threads` threads are kept; past that the least recently
+    used are dropped, after flushing any that still hold a turn.
+
+    `latest_id(thread_id, checkpoint_ns)` should return the stored latest
+    checkpoint id without reading the checkpoint itself (see
+    `dynamodb_latest_checkpoint_id`); without it, the check reads the whole
+    latest checkpoint from the wrapped saver.
+    """
+
+    def __init__(self, saver, max_threads=256, lease_seconds=0.0, latest_id=None):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.max_threads = max_threads
+        self.lease_seconds = lease_seconds
+        self.latest_id = latest_id
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Timed access to the wrapped saver
+    def _io(self, operation, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            metrics.increment(f"checkpoint.{operation}")
+            metrics.observe(f"checkpoint.{operation}", time.perf_counter() - start)
+
+    def _stored_latest_id(self, key):
+        """The id of the latest checkpoint in the wrapped saver, or None."""
+        thread_id, checkpoint_ns = key
+        if self.latest_id is not None:
+            return self._io("version_checks", self.latest_id, thread_id, checkpoint_ns)
+        checkpoint_tuple = self._io("reads", self.saver.get_tuple, {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        })
+        return checkpoint_tuple.config["configurable"]["checkpoint_id"] if checkpoint_tuple else None
+
+    def _owned_state(self, key):
+        """Return the cached state for key if this container owns it."""
+        state = self._states.get(key)
+        if state is None:
+            return None
+        if state.pending is None and time.monotonic() >= state.owned_until:
+            return None
+        self._states.move_to_end(key)
+        return state
+
+    def _adopt(self, key, checkpoint_tuple):
+        """Cache a tuple read from the wrapped saver as the thread's latest."""
+        state = _ThreadState()
+        if checkpoint_tuple is not None:
+            checkpoint_id = checkpoint_tuple.config["configurable"]["checkpoint_id"]
+            state.tuples[checkpoint_id] = checkpoint_tuple
+            state.latest_id = state.durable_id = checkpoint_id
+        state.owned_until = time.monotonic() + self.lease_seconds
+        self._states[key] = state
+        self._states.move_to_end(key)
+        # Evict least recently used threads that have nothing left to flush;
+        # the rest are flushed first by _evict_overflow
+        for old_key in list(self._states):
+            if len(self._states) <= self.max_threads:
+                break
+            if old_key != key and self._states[old_key].pending is None:
+                del self._states[old_key]
+        return state
+
+    def _evict_overflow(self):
+        """Flush and drop least recently used threads beyond max_threads."""
+        with self._lock:
+            keys = list(self._states)[:max(len(self._states) - self.max_threads, 0)]
+        for key in keys:
+            metrics.increment("checkpoint.evicted_pending")
+            self._flush_key(key)
+            with self._lock:
+                state = self._states.get(key)
+                if state is not None and state.pending is None:
+                    del self._states[key]
+
+    @staticmethod
+    def _key(config):
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def get_tuple(self, config):
+        key = self._key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            state = self._owned_state(key)
+            leased = state is not None and state.pending is None and not checkpoint_id
+            durable_id = state.durable_id if state is not None else None
+        if leased and self._stored_latest_id(key) != durable_id:
+            # Another process wrote the thread since this one last saw it
+            metrics.increment("checkpoint.stale_leases")
+            with self._lock:
+                if self._states.get(key) is state and state.pending is None:
+                    del self._states[key]
+                state = None
+        if state is not None:
+            with self._lock:
+                wanted = checkpoint_id or state.latest_id
+                if wanted is None:
+                    metrics.increment("checkpoint.memory_reads")
+                    return None
+                if wanted in state.tuples:
+                    metrics.increment("checkpoint.memory_reads")
+                    return state.tuples[wanted]
+
+        checkpoint_tuple = self._io("reads", self.saver.get_tuple, config)
+        if checkpoint_id is None:
+            with self._lock:
+                if self._owned_state(key) is None:
+                    self._adopt(key, checkpoint_tuple)
+            self._evict_overflow()
+        return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        key = self._key(config)
+        thread_id, checkpoint_ns = key
+        new_config = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+        parent_id = get_checkpoint_id(config)
+        parent_config = None
+        if parent_id:
+            parent_config = {"configurable": {**new_config["configurable"], "checkpoint_id": parent_id}}
+
+        with self._lock:
+            # The turn's get_tuple adopted the thread, whether or not it is leased
+            state = self._states.get(key) or self._adopt(key, None)
+            self._states.move_to_end(key)
+            if state.latest_id is None and parent_id:
+                # Writing on top of a checkpoint this container never read
+                state.durable_id = parent_id
+            state.tuples[checkpoint["id"]] = CheckpointTuple(
+                config=new_config,
+                checkpoint=checkpoint,
+                metadata={**metadata, **config.get("metadata", {})},
+                parent_config=parent_config,
+                pending_writes=[],
+            )
+            state.latest_id = checkpoint["id"]
+            state.pending = (config.get("metadata", {}), checkpoint, metadata, new_versions)
+        metrics.increment("checkpoint.buffered_writes")
+        self._evict_overflow()
+        return new_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        key = self._key(config)
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None and checkpoint_id in state.tuples:
+                state.tuples[checkpoint_id].pending_writes.extend(
+                    (task_id, channel, value) for channel, value in writes
+                )
+                state.writes.setdefault(checkpoint_id, []).append((writes, task_id, task_path))
+                metrics.increment("checkpoint.buffered_writes")
+                return
+        self._io("writes", self.saver.put_writes, config, writes, task_id, task_path)
+
+    def flush(self, thread_id):
+        """Write the latest buffered checkpoint of each namespace of a thread."""
+        with self._lock:
+            keys = [key for key, state in self._states.items()
+                    if key[0] == thread_id and state.pending is not None]
+        for key in keys:
+            self._flush_key(key)
+
+    def _flush_key(self, key):
+        with self._lock:
+            state = self._states.get(key)
+        if state is None:
+            return
+        with state.flush_lock:
+            self._flush_state(key, state)
+
+    def _flush_state(self, key, state):
+        with self._lock:
+            if state.pending is None:
+                return
+            pending, latest_id, durable_id = state.pending, state.latest_id, state.durable_id
+            latest_writes = list(state.writes.get(latest_id, []))
+
+        # A stand-in for a conditional put: never write over a newer checkpoint
+        if self._stored_latest_id(key) != durable_id:
+            metrics.increment("checkpoint.conflicts")
+            logger.warning(f"Thread {key[0]} was written by another process during "
+                           f"this turn; dropping the turn's checkpoint")
+            with self._lock:
+                if self._states.get(key) is state:
+                    del self._states[key]
+            return
+
+        config_metadata, checkpoint, metadata, new_versions = pending
+        configurable = {"thread_id": key[0], "checkpoint_ns": key[1]}
+        if durable_id:
+            configurable["checkpoint_id"] = durable_id
+        stored = self._io("writes", self.saver.put,
+                          {"configurable": configurable, "metadata": config_metadata},
+                          checkpoint, metadata, new_versions)
+        for writes, task_id, task_path in latest_writes:
+            self._io("writes", self.saver.put_writes, stored, writes, task_id, task_path)
+
+        with self._lock:
+            # Later steps buffered meanwhile chain onto what was just stored
+            state.durable_id = latest_id
+            if state.pending is pending:
+                state.pending = None
+                state.tuples = {latest_id: state.tuples[latest_id]}
+                state.writes = {}
+                state.owned_until = time.monotonic() + self.lease_seconds
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        if config is not None:
+            self.flush(config["configurable"]["thread_id"])
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            for key in [key for key in self._states if key[0] == thread_id]:
+                del self._states[key]
+        self._io("writes", self.saver.delete_thread, thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    # Async variants run the sync methods in a worker thread
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        ):
+            yield item
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def dynamodb_latest_checkpoint_id(saver):
+    """Return a latest_id lookup for WriteBehindCheckpointer over a DynamoDBSaver.
+
+    Queries only the key of the thread's newest checkpoint (DynamoDBSaver
+    stores checkpoints under PK "CHECKPOINT_<thread_id>", SK
+    "<checkpoint_ns>#<checkpoint_id>"), so no payload is read.
+    """
+    def latest_id(thread_id, checkpoint_ns):
+        response = saver.client.query(
+            TableName=saver.table_name,
+            KeyConditionExpression="PK = :pk AND begins_with(SK, :ns)",
+            ExpressionAttributeValues={
+                ":pk": {"S": f"CHECKPOINT_{thread_id}"},
+                ":ns": {"S": f"{checkpoint_ns}#"},
+            },
+            ProjectionExpression="id",
+            ScanIndexForward=False,
+            Limit=1,
+        )
+        items = response.get("Items", [])
+        return items[0]["id"]["S"] if items else None
+
+    return latest_id
+
+
+def _chunk_ids(artifact):
+    """Return the chunk ids a retrieval artifact refers to, or None."""
+    if not isinstance(artifact, list) or not artifact:
+        return None
+    if all(isinstance(item, str) for item in artifact):
+        return artifact
+    ids = [getattr(item, "id", None) for item in artifact]
+    return ids if all(ids) else None
+
+
+def _map_messages(value, fn):
+    """Apply fn to each message in a messages channel value or write."""
+    if isinstance(value, BaseMessage):
+        return fn(value)
+    if isinstance(value, list):
+        return [fn(item) if isinstance(item, BaseMessage) else item for item in value]
+    return value
+
+
+class ChunkIdCheckpointer(BaseCheckpointSaver):
+    """Checkpointer wrapper that stores retrieval results as chunk ids.
+
+    retrieve_context tool messages are persisted with an empty content and
+    the retrieved chunk ids as their artifact, so stored checkpoints no
+    longer grow by the full text of every retrieved chunk per turn. On read
+    the content is regenerated from the local index with `render(ids)`.
+    Tool messages stored with full Documents by older versions are slimmed
+    the next time their thread is written.
+
+    Ids are positional, so each slimmed message also records the
+    `collection_version` it was retrieved from. A message from another
+    version is not rendered from the current index; its content becomes a
+    short note and its ids are dropped.
+    """
+
+    def __init__(self, saver, render, collection_version=None, tool_name=RETRIEVAL_TOOL):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.render = render
+        self.collection_version = collection_version
+        self.tool_name = tool_name
+
+    def _is_retrieval(self, message):
+        return message.type == "tool" and message.name == self.tool_name
+
+    def _slim(self, message):
+        if not self._is_retrieval(message):
+            return message
+        ids = _chunk_ids(message.artifact)
+        if ids is None:
+            return message
+        # Keep the version a rehydrated message was originally retrieved from
+        version = message.response_metadata.get("collection_version", self.collection_version)
+        return message.model_copy(update={
+            "content": "",
+            "artifact": ids,
+            "response_metadata": {**message.response_metadata, "collection_version": version},
+        })
+
+    def _rehydrate(self, message):
+        if not self._is_retrieval(message) or message.content:
+            return message
+        ids = _chunk_ids(message.artifact)
+        if ids is None:
+            return message
+        # Messages stored before versions were recorded are assumed current
+        version = message.response_metadata.get("collection_version", self.collection_version)
+        if version != self.collection_version:
+            metrics.increment("checkpoint.stale_chunks")
+            return message.model_copy(update={"content": STALE_CONTEXT, "artifact": []})
+        return message.model_copy(update={"content": self.render(ids)})
+
+    def _map_checkpoint(self, checkpoint, fn):
+        channel_values = checkpoint["channel_values"]
+        if "messages" not in channel_values:
+            return checkpoint
+        messages = _map_messages(channel_values["messages"], fn)
+        return {**checkpoint, "channel_values": {**channel_values, "messages": messages}}
+
+    def _map_tuple(self, checkpoint_tuple):
+        if checkpoint_tuple is None:
+            return None
+        return checkpoint_tuple._replace(
+            checkpoint=self._map_checkpoint(checkpoint_tuple.checkpoint, self._rehydrate),
+            pending_writes=[
+                (task_id, channel, _map_messages(value, self._rehydrate) if channel == "messages" else value)
+                for task_id, channel, value in checkpoint_tuple.pending_writes or []
+            ],
+        )
+
+    def get_tuple(self, config):
+        return self._map_tuple(self.saver.get_tuple(config))
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        for checkpoint_tuple in self.saver.list(config, filter=filter, before=before, limit=limit):
+            yield self._map_tuple(checkpoint_tuple)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        checkpoint = self._map_checkpoint(checkpoint, self._slim)
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        writes = [
+            (channel, _map_messages(value, self._slim) if channel == "messages" else value)
+            for channel, value in writes
+        ]
+        return self.saver.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id):
+        return self.saver.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    # Async variants run the sync methods in a worker thread
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        ):
+            yield item
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,89 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from backend import metrics
+
+
+def normalize_query(text):
+    """Normalize query text so trivially different duplicates share a key."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers share its result.
+
+    Thread-based, for the blocking embedding and retrieval calls that run in
+    worker threads. Exceptions raised by the leading call are re-raised in
+    every caller that joined it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            metrics.increment(f"{self.name}.shared")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        metrics.increment(f"{self.name}.executed")
+        try:
+            flight.result = fn(*args)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+class Handoff:
+    """Results one step leaves for a later step to take once, keyed by normalized query.
+
+    Only the last `max_size` results are kept; one nobody takes is dropped
+    in turn.
+    """
+
+    def __init__(self, name, max_size=64):
+        self.name = name
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def put(self, query, result):
+        key = normalize_query(query)
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            if len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    def take(self, query):
+        """The result left for query, or None."""
+        with self._lock:
+            result = self._results.pop(normalize_query(query), None)
+        if result is not None:
+            metrics.increment(f"{self.name}.reused")
+        return result
@@ -0,0 +1,54 @@
+import re
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def _pieces(text, max_chars):
+    """Yield sentences, hard-splitting at word boundaries any longer than max_chars."""
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        for sentence in SENTENCE_END.split(paragraph.strip()):
+            piece, length = [], 0
+            for word in sentence.split():
+                if piece and length + len(word) + 1 > max_chars:
+                    yield " ".join(piece)
+                    piece, length = [], 0
+                piece.append(word)
+                length += len(word) + 1
+            if piece:
+                yield " ".join(piece)
+
+
+def split_segments(text, max_segments, min_chars=200):
+    """Split a document into sentence-aligned segments for retrieval.
+
+    Consecutive sentences are merged up to a target length that grows with
+    the document, so no text yields more than `max_segments` segments and
+    the number of embeddings (and search rows) stays bounded.
+    """
+    target = max(min_chars, 2 * len(text) // max_segments + 1)
+    segments, current = [], ""
+    for piece in _pieces(text, target):
+        if current and len(current) + len(piece) + 1 > target:
+            segments.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}".strip()
+    if current:
+        segments.append(current)
+    return segments[:max_segments]
+
+
+def aggregate_rules(scored_segments, max_rules):
+    """Merge per-segment top-k hits into the distinct rules worth citing.
+
+    Chunks retrieved by more segments rank first, then by their best
+    distance. Returns (document, best distance, segment count) tuples.
+    """
+    rules = {}
+    for scored_docs in scored_segments:
+        for doc, distance in scored_docs:
+            best, count, _ = rules.get(doc.id, (distance, 0, doc))
+            rules[doc.id] = (min(best, distance), count + 1, doc)
+    ranked = sorted(rules.values(), key=lambda rule: (-rule[1], rule[0]))
+    return [(doc, best, count) for best, count, doc in ranked[:max_rules]]
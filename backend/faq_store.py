@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+import numpy as np
+from backend import metrics
+from backend.coalescing import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Set constants
+FAQ_FORMAT_VERSION = 1
+FAQ_ANSWERS_FILE = "answers.json"
+FAQ_VECTORS_FILE = "vectors.npy"
+FAQ_MIN_SIMILARITY = 0.92
+
+
+class FaqStore:
+    """Precomputed answers to canonical questions, built by data_processing.build_faq_store.
+
+    Each entry holds a question, its answer and the chunk ids it cites. A
+    query matches an entry if its normalized text is identical or, when the
+    store has question embeddings, if its embedding's cosine similarity to a
+    question is at least `min_similarity`. Answers are only valid for the
+    collection version they were built against.
+    """
+
+    def __init__(self, entries, vectors=None, collection_version=None, built_at=None,
+                 min_similarity=FAQ_MIN_SIMILARITY):
+        self.entries = list(entries)
+        self.vectors = vectors
+        self.collection_version = collection_version
+        self.built_at = built_at
+        self.min_similarity = min_similarity
+        self._exact = {normalize_query(entry["question"]): entry for entry in self.entries}
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, directory, min_similarity=FAQ_MIN_SIMILARITY):
+        """Load a store written by `save`."""
+        with open(os.path.join(directory, FAQ_ANSWERS_FILE), "r") as file:
+            meta = json.load(file)
+        if meta["format_version"] != FAQ_FORMAT_VERSION:
+            raise ValueError(f"Unsupported FAQ store format {meta['format_version']}")
+        vectors_path = os.path.join(directory, FAQ_VECTORS_FILE)
+        vectors = np.load(vectors_path) if os.path.exists(vectors_path) else None
+        return cls(meta["entries"], vectors, meta["collection_version"], meta["built_at"],
+                   min_similarity=min_similarity)
+
+    def save(self, directory):
+        """Write entries and versions as JSON and question embeddings as .npy."""
+        os.makedirs(directory, exist_ok=True)
+        meta = {
+            "format_version": FAQ_FORMAT_VERSION,
+            "collection_version": self.collection_version,
+            "built_at": self.built_at or datetime.now(timezone.utc).isoformat(),
+            "entries": self.entries,
+        }
+        with open(os.path.join(directory, FAQ_ANSWERS_FILE), "w") as file:
+            json.dump(meta, file, indent=2)
+        if self.vectors is not None:
+            np.save(os.path.join(directory, FAQ_VECTORS_FILE), self.vectors)
+
+    @staticmethod
+    def normalize_vectors(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+    def match(self, query, embed=None):
+        """Return the entry answering query, or None.
+
+        `embed` (text -> embedding) is only called when there is no exact
+        match and the store has question embeddings.
+        """
+        entry = self._exact.get(normalize_query(query))
+        if entry is not None:
+            metrics.increment("faq.exact_hits")
+            return entry
+        if self.vectors is None or embed is None or not len(self.entries):
+            metrics.increment("faq.misses")
+            return None
+
+        vector = self.normalize_vectors(embed(query))
+        if vector.shape[-1] != self.vectors.shape[1]:
+            metrics.increment("faq.misses")
+            return None
+        similarities = self.vectors @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.min_similarity:
+            metrics.increment("faq.misses")
+            return None
+        metrics.increment("faq.near_hits")
+        return self.entries[best]
+
+
+def load_faq_store(directory, collection_version, min_similarity=FAQ_MIN_SIMILARITY):
+    """Load the store in directory if it exists and matches the serving collection.
+
+    A store built against another collection version is ignored, so a new
+    index never serves answers citing stale or missing chunks.
+    """
+    if not os.path.exists(os.path.join(directory, FAQ_ANSWERS_FILE)):
+        return None
+    store = FaqStore.load(directory, min_similarity=min_similarity)
+    if store.collection_version != collection_version:
+        metrics.increment("faq.stale_store")
+        logger.warning(f"FAQ store built for collection {store.collection_version}, "
+                       f"serving {collection_version}; ignoring it")
+        return None
+    return store
@@ -1,9 +1,34 @@
+import asyncio
+import json
+import os
 from mangum import Mangum
 from backend.main import app
+from backend.warmup import load_popular_queries, prime
+
+# The app's lifespan runs once per container (see ensure_started) rather than
+# around every event, so the index, clients and caches outlive each request
+mangum_handler = Mangum(app, lifespan="off")
+lifespan = None
+
+
+def ensure_started():
+    """Run the app's startup the first time this container handles an event."""
+    global lifespan
+    if lifespan is None:
+        context = app.router.lifespan_context(app)
+        asyncio.get_event_loop().run_until_complete(context.__aenter__())
+        lifespan = context
 
-mangum_handler = Mangum(app)
 
 def handler(event, context):
+    ensure_started()
     if event.get("warm"):
-        return {"statusCode": 200, "body": "warm"}
-    return mangum_handler(event, context)
\ No newline at end of file
+        # Prime the query path within a budget that leaves the invocation time to return
+        budget = float(event.get("budget_seconds", os.getenv("WARM_BUDGET_SECONDS", "10")))
+        if context is not None:
+            budget = min(budget, context.get_remaining_time_in_millis() / 1000 - 1)
+        top_n = int(event.get("top_n", os.getenv("WARM_TOP_QUERIES", "20")))
+        queries = event.get("queries") or load_popular_queries(os.getenv("POPULAR_QUERIES_PATH"))
+        report = prime(budget, queries[:top_n])
+        return {"statusCode": 200, "body": json.dumps({"warm": True, **report})}
+    return mangum_handler(event, context)
@@ -1,6 +1,8 @@
+import os
 from contextlib import AsyncExitStack
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 
 from backend.style_guide import lifespan_mechanism, sub_application_style_guide
@@ -9,6 +11,10 @@ description = """
 StyleGuideBot app is a FastAPI application that supports the following endpoints:
 * bot/health
 * bot/query
+* bot/query/batch
+* bot/review
+* bot/chunks/{chunk_id}
+* bot/chunks?ids=...
 * /docs
 * /openapi.json
 * bot/docs
@@ -28,6 +34,16 @@ async def main_lifespan(app: FastAPI):
 app = FastAPI(lifespan=main_lifespan, description=description)
 
 
+# Optionally compress responses: brotli when brotli-asgi is installed, otherwise
+# gzip. API Gateway must treat */* as binary before this is turned on.
+if os.getenv("COMPRESS_RESPONSES", "off") == "on":
+    try:
+        from brotli_asgi import BrotliMiddleware
+        app.add_middleware(BrotliMiddleware, minimum_size=500, gzip_fallback=True)
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=500)
+
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import defaultdict
+
+# In-process counters and timings for this container, served by /bot/metrics.
+# Each Lambda container (or uvicorn worker) keeps its own values.
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timings = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0})
+
+
+def increment(name, amount=1):
+    """Add `amount` to a named counter."""
+    with _lock:
+        _counters[name] += amount
+
+
+def observe(name, seconds):
+    """Record one duration sample for a named timing."""
+    with _lock:
+        timing = _timings[name]
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+
+
+def process_memory():
+    """Memory of this process in bytes.
+
+    On Linux, from /proc/self/smaps_rollup: rss, pss (shared pages divided
+    between the processes mapping them, so summing pss over workers gives
+    their real footprint), uss (private to this process) and shared.
+    Elsewhere only the peak rss is available.
+    """
+    try:
+        with open("/proc/self/smaps_rollup", "r") as file:
+            fields = {}
+            for line in file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        import resource
+        return {"pid": os.getpid(), "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    return {
+        "pid": os.getpid(),
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def snapshot():
+    """Return a JSON-serializable copy of all counters and timings, plus process memory."""
+    memory = process_memory()
+    with _lock:
+        return {
+            "memory": memory,
+            "counters": dict(_counters),
+            "timings": {
+                name: {
+                    "count": timing["count"],
+                    "mean": timing["total"] / timing["count"],
+                    "max": timing["max"],
+                }
+                for name, timing in _timings.items()
+            },
+        }
+
+
+def reset():
+    """Clear all recorded values."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
@@ -0,0 +1,130 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from langchain.agents.middleware import AgentMiddleware
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouterThresholds:
+    """Limits a query must stay within to be answered by the fast model."""
+    max_words: int = 15
+    max_questions: int = 1
+    max_distance: float = 0.9
+    max_session_depth: int = 3
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_words=int(os.getenv("ROUTER_MAX_WORDS", cls.max_words)),
+            max_questions=int(os.getenv("ROUTER_MAX_QUESTIONS", cls.max_questions)),
+            max_distance=float(os.getenv("ROUTER_MAX_DISTANCE", cls.max_distance)),
+            max_session_depth=int(os.getenv("ROUTER_MAX_SESSION_DEPTH", cls.max_session_depth)),
+        )
+
+
+@dataclass
+class RouteDecision:
+    tier: str
+    reason: str
+    words: int
+    questions: int
+    top_distance: float
+    session_depth: int
+
+
+def choose_model(query, top_distance, session_depth, thresholds):
+    """Pick "fast" for short, confidently-retrieved questions, else "large".
+
+    top_distance is the distance of the best retrieved chunk (squared L2,
+    lower is closer); session_depth is the number of earlier turns.
+    """
+    words = len(query.split())
+    questions = max(query.count("?"), 1)
+    reason = None
+    if words > thresholds.max_words:
+        reason = f"{words} words > {thresholds.max_words}"
+    elif questions > thresholds.max_questions:
+        reason = f"{questions} questions > {thresholds.max_questions}"
+    elif top_distance > thresholds.max_distance:
+        reason = f"top distance {top_distance:.3f} > {thresholds.max_distance}"
+    elif session_depth > thresholds.max_session_depth:
+        reason = f"session depth {session_depth} > {thresholds.max_session_depth}"
+    tier = "large" if reason else "fast"
+    reason = reason or "short, high-confidence query"
+    return RouteDecision(tier, reason, words, questions, top_distance, session_depth)
+
+
+def record_decision(decision):
+    """Log a routing decision and count it per tier."""
+    metrics.increment(f"router.{decision.tier}")
+    logger.info(
+        f"Routed to {decision.tier} model ({decision.reason}): words={decision.words}, "
+        f"questions={decision.questions}, top_distance={decision.top_distance:.3f}, "
+        f"session_depth={decision.session_depth}"
+    )
+
+
+def session_features(messages):
+    """Return (current query, number of earlier turns, query message id) from agent messages."""
+    human_messages = [message for message in messages if message.type == "human"]
+    return human_messages[-1].text, len(human_messages) - 1, human_messages[-1].id
+
+
+class ModelRouterMiddleware(AgentMiddleware):
+    """Swap the agent's model per turn based on cheap query features.
+
+    `models` maps "fast" and "large" to chat models; `top_distance` returns
+    the best retrieval distance for a query (its search is reused by
+    retrieve_context). A turn is scored once, on the call that decides
+    whether to retrieve; later calls in the turn reuse the decision, kept
+    for the last `max_turns` turns. Per-model latency is recorded for every
+    call.
+    """
+
+    def __init__(self, models, top_distance, thresholds, max_turns=1024):
+        super().__init__()
+        self.models = models
+        self.top_distance = top_distance
+        self.thresholds = thresholds
+        self.max_turns = max_turns
+        self._tiers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _route(self, request):
+        query, session_depth, turn_id = session_features(request.messages)
+        first_call = request.messages[-1].type == "human"
+        if not first_call:
+            with self._lock:
+                tier = self._tiers.get(turn_id)
+            if tier is not None:
+                return tier
+
+        decision = choose_model(query, self.top_distance(query), session_depth, self.thresholds)
+        if first_call:
+            record_decision(decision)
+        if turn_id is not None:
+            with self._lock:
+                self._tiers[turn_id] = decision.tier
+                if len(self._tiers) > self.max_turns:
+                    self._tiers.popitem(last=False)
+        return decision.tier
+
+    def wrap_model_call(self, request, handler):
+        tier = self._route(request)
+        start = time.perf_counter()
+        response = handler(request.override(model=self.models[tier]))
+        metrics.observe(f"llm.{tier}", time.perf_counter() - start)
+        return response
+
+    async def awrap_model_call(self, request, handler):
+        tier = self._route(request)
+        start = time.perf_counter()
+        response = await handler(request.override(model=self.models[tier]))
+        metrics.observe(f"llm.{tier}", time.perf_counter() - start)
+        return response
@@ -0,0 +1,193 @@
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set constants
+PROFILE_HEADER = "x-profile"
+PROFILE_INTERVAL = 0.005
+SIGNATURE_MAX_AGE = 300
+TOP_FUNCTIONS = 10
+
+# Where sampled time is spent: a sample goes to the first category matching
+# its innermost frame, walking outwards (so JSON parsing inside botocore is
+# "json", and botocore waiting on a socket is "network")
+CATEGORIES = [
+    ("network", ("/ssl.py", "/socket.py", "/http/client.py", "/urllib3/", "/httpx/", "/httpcore/")),
+    ("json", ("/json/", "/pydantic/", "/pydantic_core/")),
+    ("sqlite", ("/sqlite3/",)),
+    ("chroma", ("/chromadb/", "/langchain_chroma/")),
+    ("numpy", ("/numpy/",)),
+    ("aws_sdk", ("/botocore/", "/boto3/", "/langchain_aws/")),
+    ("langgraph", ("/langgraph/",)),
+    ("langchain", ("/langchain/", "/langchain_core/", "/langchain_anthropic/")),
+    ("backend", ("/backend/",)),
+]
+
+# Innermost frames of threads that are parked rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfileSettings:
+    """Which requests to profile and where to write their profiles."""
+
+    def __init__(self, secret=None, sample_rate=0.0, directory="/tmp/profiles",
+                 interval=PROFILE_INTERVAL):
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.interval = interval
+
+    @classmethod
+    def from_env(cls):
+        """Settings from PROFILE_* variables, or None unless PROFILE_MODE=on."""
+        if os.getenv("PROFILE_MODE", "off") != "on":
+            return None
+        return cls(
+            secret=os.getenv("PROFILE_SECRET") or None,
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            directory=os.getenv("PROFILE_DIR", "/tmp/profiles"),
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000,
+        )
+
+
+def sign_profile_request(secret, timestamp=None):
+    """Value for the X-Profile header: "<unix time>.<HMAC-SHA256 of it>"."""
+    timestamp = str(int(timestamp if timestamp is not None else time.time()))
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{timestamp}.{digest}"
+
+
+def valid_signature(secret, value):
+    """Whether an X-Profile header was signed with secret in the last SIGNATURE_MAX_AGE seconds."""
+    timestamp, _, digest = value.partition(".")
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE:
+        return False
+    return hmac.compare_digest(sign_profile_request(secret, int(timestamp)), value)
+
+
+def should_profile(request, settings):
+    """Profile if the request carries a valid signed header, or is sampled."""
+    header = request.headers.get(PROFILE_HEADER)
+    if header and settings.secret and valid_signature(settings.secret, header):
+        return True
+    return settings.sample_rate > 0 and random.random() < settings.sample_rate
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _category(frames):
+    for frame in frames:
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        for name, fragments in CATEGORIES:
+            if any(fragment in filename for fragment in fragments):
+                return name
+    return "other"
+
+
+class StackSampler:
+    """Sample the Python stacks of all other threads every `interval` seconds.
+
+    Covers the event loop and the worker threads that blocking calls run in.
+    On Lambda a container serves one request at a time, so every busy
+    thread belongs to the profiled request; under a multi-request server,
+    concurrent requests show up in the profile too.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self.leaves = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.wall_seconds = time.perf_counter() - self.started_at
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                leaf = frames[0].f_code
+                if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FRAMES:
+                    continue
+                self.samples += 1
+                self.stacks[";".join(_frame_label(f) for f in reversed(frames))] += 1
+                self.categories[_category(frames)] += 1
+                self.leaves[_frame_label(frames[0])] += 1
+
+    def folded(self):
+        """Collapsed stacks, one "frame;frame;... count" line each (flamegraph.pl, speedscope)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        """Sampled seconds per category and for the busiest innermost functions."""
+        return {
+            "wall_seconds": round(self.wall_seconds, 4),
+            "sampled_seconds": round(self.samples * self.interval, 4),
+            "categories": {name: round(count * self.interval, 4)
+                           for name, count in self.categories.most_common()},
+            "top_functions": {name: round(count * self.interval, 4)
+                              for name, count in self.leaves.most_common(TOP_FUNCTIONS)},
+        }
+
+
+def start_profile(request, settings):
+    """Start a sampler for this request if it should be profiled, else return None."""
+    if not should_profile(request, settings):
+        return None
+    metrics.increment("profiles")
+    return StackSampler(settings.interval).start()
+
+
+def finish_profile(sampler, response, settings):
+    """Stop the sampler, write its folded stacks and report them on the response.
+
+    Adds a Server-Timing header with sampled milliseconds per category and
+    an X-Profile-File header naming the written profile.
+    """
+    sampler.stop()
+    summary = sampler.summary()
+    os.makedirs(settings.directory, exist_ok=True)
+    path = os.path.join(settings.directory,
+                        f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.folded")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(sampler.folded())
+
+    timings = [f"total;dur={summary['wall_seconds'] * 1000:.1f}"]
+    timings += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in summary["categories"].items()]
+    response.headers["Server-Timing"] = ", ".join(timings)
+    response.headers["X-Profile-File"] = os.path.basename(path)
+    logger.info(f"Profiled query in {summary['wall_seconds']:.3f}s -> {path}: {summary}")
+    return summary
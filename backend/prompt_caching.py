@@ -0,0 +1,106 @@
+import logging
+from langchain.agents.middleware import AgentMiddleware
+from backend import metrics
+
+# Anthropic prompt caching (direct API and Bedrock InvokeModel) reads
+# cache_control markers from content blocks. The cache is prefix-based in the
+# order tools -> system -> messages, so a marker on the system prompt also
+# covers the tool schema; ChatBedrock does not pass markers on tool
+# definitions through, so none are set there. Prefixes shorter than the
+# model's minimum (1024 tokens for Sonnet, 2048 for Haiku) are not cached,
+# which is why the end of the stored history is marked as well.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+logger = logging.getLogger(__name__)
+
+
+def _with_cache_marker(message):
+    """Copy a message with cache_control on its last content block.
+
+    Returns None for messages with no text to attach the marker to (e.g. an
+    AI message that only carries tool calls).
+    """
+    content = message.content
+    if isinstance(content, str):
+        if not content:
+            return None
+        blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    elif content:
+        blocks = list(content)
+        last = blocks[-1]
+        if isinstance(last, str):
+            last = {"type": "text", "text": last}
+        blocks[-1] = {**last, "cache_control": CACHE_CONTROL}
+    else:
+        return None
+    return message.model_copy(update={"content": blocks})
+
+
+def cache_system_message(system_message):
+    """Mark the end of the system prompt as a cache breakpoint."""
+    if system_message is None:
+        return None
+    return _with_cache_marker(system_message) or system_message
+
+
+def cache_history(messages):
+    """Mark the end of the stored history, i.e. everything before the current turn.
+
+    Messages are copied; checkpointed state never carries the markers.
+    """
+    human_positions = [i for i, message in enumerate(messages) if message.type == "human"]
+    if not human_positions:
+        return messages
+    for i in range(human_positions[-1] - 1, -1, -1):
+        tagged = _with_cache_marker(messages[i])
+        if tagged is not None:
+            return [*messages[:i], tagged, *messages[i + 1:]]
+    return messages
+
+
+def record_cache_usage(message):
+    """Log and count the prompt cache tokens reported for one LLM response."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    details = usage.get("input_token_details") or {}
+    cache_read = details.get("cache_read", 0) or 0
+    cache_write = details.get("cache_creation", 0) or 0
+    metrics.increment("llm.calls")
+    metrics.increment("llm.input_tokens", usage.get("input_tokens", 0))
+    metrics.increment("llm.cache_read_tokens", cache_read)
+    metrics.increment("llm.cache_write_tokens", cache_write)
+    logger.info(
+        f"LLM usage: {usage.get('input_tokens', 0)} input tokens "
+        f"({cache_read} cache read, {cache_write} cache write), "
+        f"{usage.get('output_tokens', 0)} output tokens"
+    )
+
+
+class PromptCachingMiddleware(AgentMiddleware):
+    """Add cache breakpoints to every agent model call and record cache usage.
+
+    With enabled=False requests are left untouched but usage is still recorded.
+    """
+
+    def __init__(self, enabled=True):
+        super().__init__()
+        self.enabled = enabled
+
+    def _apply_caching(self, request):
+        if not self.enabled:
+            return request
+        return request.override(
+            system_message=cache_system_message(request.system_message),
+            messages=cache_history(request.messages),
+        )
+
+    def _record(self, response):
+        for message in response.result:
+            if message.type == "ai":
+                record_cache_usage(message)
+        return response
+
+    def wrap_model_call(self, request, handler):
+        return self._record(handler(self._apply_caching(request)))
+
+    async def awrap_model_call(self, request, handler):
+        return self._record(await handler(self._apply_caching(request)))
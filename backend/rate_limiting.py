@@ -0,0 +1,260 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+import boto3
+import limits
+from limits.storage import Storage
+from slowapi.util import get_remote_address
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Set constants
+MAX_LEASE = 16
+LEASE_REFILL_SECONDS = 10.0
+
+
+# Client address for rate limiting
+def client_ip(request, trusted_proxies=0):
+    """The caller's IP as API Gateway saw it.
+
+    Behind Mangum the connecting address is the event's requestContext
+    sourceIp. If `trusted_proxies` proxies (e.g. CloudFront) sit in front of
+    API Gateway, the client is that many entries from the right of
+    X-Forwarded-For; entries further left are client-supplied and ignored.
+    """
+    event = request.scope.get("aws.event") or {}
+    request_context = event.get("requestContext") or {}
+    source_ip = ((request_context.get("identity") or {}).get("sourceIp")
+                 or (request_context.get("http") or {}).get("sourceIp")
+                 or get_remote_address(request))
+    if not trusted_proxies:
+        return source_ip
+    forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",")
+                 if address.strip()]
+    if forwarded and forwarded[-1] == source_ip:
+        forwarded.pop()
+    addresses = forwarded + [source_ip]
+    return addresses[max(len(addresses) - 1 - trusted_proxies, 0)]
+
+
+# Shared hit counters, one per rate-limit key and window
+class DynamoDBCounters:
+    """Counters in a DynamoDB table keyed by `rate_key`, expired by TTL on `expires_at`."""
+
+    def __init__(self, table_name, region_name="us-east-1"):
+        self.table = boto3.resource("dynamodb", region_name=region_name).Table(table_name)
+
+    def add(self, key, amount, expires_at):
+        response = self.table.update_item(
+            Key={"rate_key": key},
+            UpdateExpression="ADD hits :amount SET expires_at = if_not_exists(expires_at, :expires_at)",
+            ExpressionAttributeValues={":amount": amount, ":expires_at": int(expires_at) + 60},
+            ReturnValues="UPDATED_NEW"
+        )
+        return int(response["Attributes"]["hits"])
+
+    def get(self, key):
+        item = self.table.get_item(Key={"rate_key": key}, ConsistentRead=True).get("Item")
+        return int(item["hits"]) if item else 0
+
+    def delete(self, key):
+        self.table.delete_item(Key={"rate_key": key})
+
+    def clear(self):
+        return None
+
+
+class SQLiteCounters:
+    """Counters in a SQLite file, shared by processes on one host (":memory:" for one process)."""
+
+    def __init__(self, path=":memory:"):
+        self.conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits "
+                "(rate_key TEXT PRIMARY KEY, hits INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def add(self, key, amount, expires_at):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM rate_limits WHERE expires_at < ?", (time.time(),))
+                self.conn.execute(
+                    "INSERT INTO rate_limits VALUES (?, ?, ?) "
+                    "ON CONFLICT(rate_key) DO UPDATE SET hits = hits + excluded.hits",
+                    (key, amount, expires_at)
+                )
+                hits = self.conn.execute(
+                    "SELECT hits FROM rate_limits WHERE rate_key = ?", (key,)
+                ).fetchone()[0]
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return hits
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT hits FROM rate_limits WHERE rate_key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def delete(self, key):
+        with self._lock:
+            self.conn.execute("DELETE FROM rate_limits WHERE rate_key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            return self.conn.execute("DELETE FROM rate_limits").rowcount
+
+
+def counters_from_uri(uri, region_name="us-east-1"):
+    """dynamodb://<table>, or sqlite://<absolute path> (sqlite:// alone is in-memory)."""
+    parsed = urlparse(uri)
+    if parsed.scheme == "dynamodb":
+        return DynamoDBCounters(parsed.netloc, region_name)
+    return SQLiteCounters(parsed.path or ":memory:")
+
+
+class _Lease:
+    """Hit numbers [next, end] claimed from the shared counter by this process."""
+
+    def __init__(self, end, size, expires_at):
+        self.next = end - size + 1
+        self.end = end
+        self.size = size
+        self.expires_at = expires_at
+        self.granted_at = time.monotonic()
+
+
+class LeasedStorage(Storage):
+    """Fixed-window rate-limit storage over a shared counter, with local leases.
+
+    Each hit needs a number from the shared per-window counter, and is
+    allowed if that number is within the limit. Rather than one atomic add
+    per hit, a process claims a block of numbers at once and hands them out
+    locally. A key that uses up its block within LEASE_REFILL_SECONDS gets
+    a block twice as large next time (up to `max_lease`), so hot keys cost
+    a few store calls per minute while a quiet key claims one number at a
+    time. Numbers are never handed out twice, so the limit is never
+    exceeded across processes; unused numbers in a block are simply lost
+    when the window ends, which can only make the limit stricter.
+
+    Windows are aligned to the clock (hour boundaries for "/hour"). If the
+    shared store fails, the key is counted locally for the rest of the
+    window, i.e. the limit degrades to per-process.
+
+    Registered with limits as dynamodb://<table> and sqlite://<path>.
+    """
+
+    STORAGE_SCHEME = ["dynamodb", "sqlite"]
+
+    def __init__(self, uri, wrap_exceptions=False, max_lease=MAX_LEASE,
+                 region_name="us-east-1", counters=None, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.counters = counters or counters_from_uri(uri, region_name)
+        self.max_lease = int(max_lease)
+        self._leases = {}
+        self._expiries = {}
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+
+    @property
+    def base_exceptions(self):
+        return Exception
+
+    def _window(self, key, expiry=None):
+        """(window key, window end) for the current window of a limits key."""
+        if expiry is None:
+            expiry = self._expiries.get(key)
+        if expiry is None:
+            # limits keys end with "<amount>/<multiples>/<granularity>"
+            amount, multiples, granularity = key.rsplit("/", 3)[1:]
+            expiry = limits.parse(f"{amount} per {multiples} {granularity}").get_expiry()
+            self._expiries[key] = expiry
+        window = int(time.time() // expiry)
+        return f"{key}/{window}", (window + 1) * expiry
+
+    def _claim(self, window_key, amount, expires_at):
+        start = time.perf_counter()
+        try:
+            return self.counters.add(window_key, amount, expires_at)
+        finally:
+            metrics.increment("rate_limit.store_calls")
+            metrics.observe("rate_limit.store", time.perf_counter() - start)
+
+    def incr(self, key, expiry, amount=1):
+        self._expiries[key] = expiry
+        window_key, expires_at = self._window(key, expiry)
+        with self._lock:
+            key_lock = self._key_locks[window_key]
+        with key_lock:
+            lease = self._leases.get(window_key)
+            if lease is not None and lease.end - lease.next + 1 >= amount:
+                lease.next += amount
+                metrics.increment("rate_limit.leased_hits")
+                return lease.next - 1
+
+            size = 1
+            if lease is not None and time.monotonic() - lease.granted_at < LEASE_REFILL_SECONDS:
+                size = min(lease.size * 2, self.max_lease)
+            size = max(size, amount)
+            try:
+                end = self._claim(window_key, size, expires_at)
+            except Exception as e:
+                logger.warning(f"Rate limit store unavailable, counting {key} locally: {e}")
+                metrics.increment("rate_limit.store_errors")
+                end = (lease.next - 1 if lease is not None else 0) + size
+            lease = _Lease(end, size, expires_at)
+            lease.next += amount
+            with self._lock:
+                self._prune()
+                self._leases[window_key] = lease
+            return lease.next - 1
+
+    def _prune(self):
+        """Drop leases (and their locks) from windows that have ended."""
+        now = time.time()
+        for window_key, lease in list(self._leases.items()):
+            if lease.expires_at < now:
+                del self._leases[window_key]
+                self._key_locks.pop(window_key, None)
+
+    def get(self, key):
+        window_key, _ = self._window(key)
+        try:
+            return self.counters.get(window_key)
+        except Exception as e:
+            logger.warning(f"Rate limit store unavailable, reading {key} locally: {e}")
+            lease = self._leases.get(window_key)
+            return lease.next - 1 if lease is not None else 0
+
+    def get_expiry(self, key):
+        return self._window(key)[1]
+
+    def check(self):
+        try:
+            self.counters.get("health-check")
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+            self._key_locks.clear()
+        return self.counters.clear()
+
+    def clear(self, key):
+        window_key, _ = self._window(key)
+        with self._lock:
+            self._leases.pop(window_key, None)
+        self.counters.delete(window_key)
@@ -0,0 +1,36 @@
+import argparse
+import os
+import uvicorn
+
+# Run from the repository root: python -m backend.serve --workers 8
+# Serves backend.main:app from several uvicorn worker processes on one host.
+# Each worker memory-maps the same compact index read-only, so the vectors
+# and chunk texts are held once in the page cache however many workers run;
+# /bot/metrics reports each worker's own memory.
+
+
+def prepare_index():
+    """Download the compact index once, before workers start, when not running locally."""
+    if os.environ["ENVIRONMENT"] == "local":
+        return
+    from backend.style_guide import COMPACT_INDEX_LAMBDA, download_index_from_s3
+    download_index_from_s3('compact_index/', COMPACT_INDEX_LAMBDA)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve StyleGuideBot from several worker processes.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes (default: one per core).")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    # Shared read-only index; per-IP limits counted in one SQLite file for all workers
+    os.environ.setdefault("ENVIRONMENT", "local")
+    os.environ.setdefault("INDEX_FORMAT", "compact")
+    os.environ.setdefault("INDEX_MMAP", "on")
+    os.environ.setdefault("RATE_LIMIT_STORAGE", "sqlite:///tmp/styleguidebot-rate-limits.db")
+    if os.environ["INDEX_FORMAT"] != "compact":
+        parser.error("multi-process serving shares the compact index; set INDEX_FORMAT=compact")
+    prepare_index()
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
@@ -0,0 +1,373 @@
+import hashlib
+import json
+import mmap
+import os
+import numpy as np
+from langchain_core.documents import Document
+from backend import metrics
+
+# Set constants
+INDEX_META_FILE = "index.json"
+INDEX_VECTORS_FILE = "vectors.npy"
+INDEX_SCALES_FILE = "scales.npy"
+INDEX_DOCUMENTS_FILE = "documents.bin"
+INDEX_DOCUMENT_OFFSETS_FILE = "document_offsets.npy"
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+SCORE_BLOCK_ROWS = 8192
+HIERARCHY_SECTIONS = 8
+HIERARCHY_MIN_CHUNKS = 2000
+
+
+# Helper functions shared by the index build and the query path
+def collection_version(ids, documents):
+    """Hash chunk ids and content so caches can tell when the corpus changed."""
+    digest = hashlib.sha256()
+    for chunk_id, document in zip(ids, documents):
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(document.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def reduce_dimensions(vectors, dimensions=None):
+    """Truncate embeddings to their first `dimensions` values and re-normalize.
+
+    text-embedding-3 models are trained so that a truncated, re-normalized
+    vector matches what the API returns when asked for fewer dimensions.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if dimensions:
+        vectors = vectors[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors, dtype="float32"):
+    """Convert normalized vectors to the storage dtype.
+
+    Returns the stored matrix and, for int8, the per-row scale needed to
+    map values back to floats (None otherwise).
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported index dtype: {dtype}")
+    if dtype == "int8":
+        max_abs = np.abs(vectors).max(axis=1)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales
+    return vectors.astype(dtype), None
+
+
+def section_key(metadata):
+    """Group a chunk under its nearest level-2/level-3 heading.
+
+    chunkify.py sets `parent` to the heading one level up for level-3+
+    sections, so level-3 chunks group under their level-2 heading and
+    level-4 chunks under their level-3 heading.
+    """
+    return metadata.get("parent") or metadata.get("title", "")
+
+
+class ChunkTexts:
+    """Read-only sequence of chunk texts stored as one UTF-8 blob plus offsets.
+
+    Loaded with mmap=True, the blob and offsets are memory-mapped, so every
+    process serving the same index shares one copy in the page cache and a
+    text is only decoded when it is accessed.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_texts(cls, texts):
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    @classmethod
+    def load(cls, persist_directory, mmap=False):
+        path = os.path.join(persist_directory, INDEX_DOCUMENTS_FILE)
+        offsets = np.load(os.path.join(persist_directory, INDEX_DOCUMENT_OFFSETS_FILE),
+                          mmap_mode="r" if mmap else None)
+        if mmap and os.path.getsize(path):
+            blob = np.memmap(path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(path, dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def save(self, persist_directory):
+        self.blob.tofile(os.path.join(persist_directory, INDEX_DOCUMENTS_FILE))
+        np.save(os.path.join(persist_directory, INDEX_DOCUMENT_OFFSETS_FILE), self.offsets)
+
+    @property
+    def nbytes(self):
+        return self.blob.nbytes + self.offsets.nbytes
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        return self.blob[self.offsets[position]:self.offsets[position + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class VectorIndex:
+    """Exact-search vector index kept in NumPy arrays.
+
+    Exposes the subset of the Chroma vector store API used by the backend
+    (`similarity_search`, `similarity_search_with_score`, `get_by_ids`) so it
+    can be swapped in for the `collection` global. Distances are squared L2
+    between unit vectors, matching Chroma's default space.
+    """
+
+    def __init__(self, vectors, ids, documents, metadatas, dimensions=None,
+                 scales=None, version=None, embedding_function=None):
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = list(ids)
+        self.documents = documents if isinstance(documents, ChunkTexts) else list(documents)
+        self.metadatas = list(metadatas)
+        self.dimensions = dimensions
+        self.version = version or collection_version(self.ids, self.documents)
+        self.embedding_function = embedding_function
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self.section_keys = None
+        self.centroids = None
+        self.section_offsets = None
+        self.section_rows = None
+        self.hierarchy_sections = HIERARCHY_SECTIONS
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    @classmethod
+    def from_embeddings(cls, ids, embeddings, documents, metadatas,
+                        dimensions=None, dtype="float32", embedding_function=None):
+        """Build an index from full-size embeddings, reducing and quantizing them."""
+        vectors, scales = quantize(reduce_dimensions(embeddings, dimensions), dtype)
+        return cls(vectors, ids, documents, metadatas, dimensions=dimensions,
+                   scales=scales, embedding_function=embedding_function)
+
+    @classmethod
+    def load(cls, persist_directory, embedding_function=None, mmap=False):
+        """Load an index written by `save`.
+
+        With mmap=True the vectors and chunk texts are memory-mapped
+        read-only instead of copied into this process, so worker processes
+        serving the same files share them.
+        """
+        with open(os.path.join(persist_directory, INDEX_META_FILE), "r") as file:
+            meta = json.load(file)
+        mmap_mode = "r" if mmap else None
+        vectors = np.load(os.path.join(persist_directory, INDEX_VECTORS_FILE), mmap_mode=mmap_mode)
+        scales = None
+        if meta["dtype"] == "int8":
+            scales = np.load(os.path.join(persist_directory, INDEX_SCALES_FILE), mmap_mode=mmap_mode)
+        # Indexes written before documents.bin kept the texts in index.json
+        if "documents" in meta:
+            documents = meta["documents"]
+        else:
+            documents = ChunkTexts.load(persist_directory, mmap)
+        return cls(vectors, meta["ids"], documents, meta["metadatas"],
+                   dimensions=meta["dimensions"], scales=scales,
+                   version=meta["version"], embedding_function=embedding_function)
+
+    def save(self, persist_directory):
+        """Write vectors as .npy files, chunk texts as a UTF-8 blob and the rest as JSON."""
+        os.makedirs(persist_directory, exist_ok=True)
+        np.save(os.path.join(persist_directory, INDEX_VECTORS_FILE), self.vectors)
+        if self.scales is not None:
+            np.save(os.path.join(persist_directory, INDEX_SCALES_FILE), self.scales)
+        documents = self.documents
+        if not isinstance(documents, ChunkTexts):
+            documents = ChunkTexts.from_texts(documents)
+        documents.save(persist_directory)
+        meta = {
+            "version": self.version,
+            "dimensions": self.dimensions,
+            "dtype": self.dtype,
+            "ids": self.ids,
+            "metadatas": self.metadatas,
+        }
+        with open(os.path.join(persist_directory, INDEX_META_FILE), "w") as file:
+            json.dump(meta, file)
+
+    @property
+    def dtype(self):
+        return str(self.vectors.dtype)
+
+    @property
+    def nbytes(self):
+        """Memory held by the vector matrix (and int8 scales)."""
+        scale_bytes = self.scales.nbytes if self.scales is not None else 0
+        return self.vectors.nbytes + scale_bytes
+
+    @property
+    def mapped_bytes(self):
+        """Bytes of vectors and chunk texts memory-mapped rather than held privately."""
+        arrays = [self.vectors, self.scales]
+        if isinstance(self.documents, ChunkTexts):
+            arrays += [self.documents.blob, self.documents.offsets]
+        return sum(array.nbytes for array in arrays if isinstance(array, np.memmap))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def touch(self):
+        """Read one value per memory page of the vectors and scales.
+
+        Keeps the first search from paying for page faults after a cold start
+        or when the arrays are memory-mapped. Returns the bytes covered.
+        """
+        for array in (self.vectors, self.scales):
+            if array is not None:
+                flat = array.reshape(-1)
+                flat[::max(mmap.PAGESIZE // flat.itemsize, 1)].sum()
+        return self.nbytes
+
+    def prepare_queries(self, query_vectors):
+        """Apply the index's dimension reduction to raw query embeddings."""
+        return reduce_dimensions(query_vectors, self.dimensions)
+
+    def _similarities(self, queries, rows=None):
+        """Cosine similarity of each query against each (selected) row.
+
+        Rows are de-quantized in blocks so int8/float16 matrices never need a
+        full float32 copy in memory.
+        """
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        scales = self.scales if rows is None or self.scales is None else self.scales[rows]
+        sims = np.empty((queries.shape[0], matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+            block = matrix[start:start + SCORE_BLOCK_ROWS].astype(np.float32, copy=False)
+            block_sims = queries @ block.T
+            if scales is not None:
+                block_sims *= scales[start:start + SCORE_BLOCK_ROWS]
+            sims[:, start:start + SCORE_BLOCK_ROWS] = block_sims
+        return sims
+
+    def search_by_vectors(self, query_vectors, k=4, rows=None):
+        """Exact top-k for a batch of query embeddings.
+
+        Returns (positions, distances), both shaped (n_queries, k), sorted by
+        increasing distance. `rows` optionally restricts the search to a
+        subset of chunk positions.
+        """
+        return self._top_k(self.prepare_queries(query_vectors), k, rows)
+
+    def build_sections(self, sections=HIERARCHY_SECTIONS):
+        """Precompute one centroid per section for two-stage search.
+
+        Members of each section are stored contiguously in `section_rows`
+        (CSR-style, delimited by `section_offsets`); centroids are the
+        re-normalized mean of their de-quantized member vectors. Afterwards
+        `search` first picks the `sections` closest centroids, then ranks
+        only their chunks.
+        """
+        keys = [section_key(metadata) for metadata in self.metadatas]
+        self.section_keys, section_of_row = np.unique(np.array(keys, dtype=object), return_inverse=True)
+        self.section_rows = np.argsort(section_of_row, kind="stable")
+        counts = np.bincount(section_of_row, minlength=len(self.section_keys))
+        self.section_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+        sums = np.zeros((len(self.section_keys), self.vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = self.vectors[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            if self.scales is not None:
+                block *= self.scales[start:start + SCORE_BLOCK_ROWS, None]
+            np.add.at(sums, section_of_row[start:start + SCORE_BLOCK_ROWS], block)
+        self.centroids = reduce_dimensions(sums)
+        self.hierarchy_sections = sections
+
+    def search(self, query_vectors, k=4):
+        """Top-k via section centroids when built, else exact search.
+
+        Falls back to exact search for small indexes and whenever the
+        selected sections hold fewer than k chunks. The fallback does not
+        guard against choosing the wrong sections: a chunk outside the
+        selected sections is never returned, however close it is, so recall
+        depends on how well centroids separate the corpus (measure it with
+        benchmarks/hierarchical_index.py before raising or lowering
+        HIERARCHY_SECTIONS).
+        """
+        queries = self.prepare_queries(query_vectors)
+        if self.centroids is None or len(self.ids) < HIERARCHY_MIN_CHUNKS:
+            return self._top_k(queries, k)
+
+        n_sections = min(self.hierarchy_sections, len(self.section_keys))
+        centroid_sims = queries @ self.centroids.T
+        top_sections = np.argpartition(-centroid_sims, n_sections - 1, axis=1)[:, :n_sections]
+        positions = np.empty((queries.shape[0], k), dtype=np.int64)
+        distances = np.empty((queries.shape[0], k), dtype=np.float32)
+        for i, sections in enumerate(top_sections):
+            rows = np.concatenate([
+                self.section_rows[self.section_offsets[s]:self.section_offsets[s + 1]]
+                for s in sections
+            ])
+            if len(rows) < k:
+                metrics.increment("retrieval.exact_fallbacks")
+                rows = None
+            positions[i], distances[i] = (part[0] for part in self._top_k(queries[i:i + 1], k, rows))
+        return positions, distances
+
+    def _top_k(self, queries, k, rows=None):
+        sims = self._similarities(queries, rows)
+        k = min(k, sims.shape[1])
+        if k == 0:
+            shape = (queries.shape[0], 0)
+            return np.empty(shape, dtype=np.int64), np.empty(shape, dtype=np.float32)
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_sims = np.take_along_axis(top_sims, order, axis=1)
+        if rows is not None:
+            top = np.asarray(rows)[top]
+        return top, 2.0 - 2.0 * top_sims
+
+    def _document(self, position):
+        return Document(
+            id=self.ids[position],
+            page_content=self.documents[position],
+            metadata=self.metadatas[position],
+        )
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        positions, distances = self.search([embedding], k)
+        return [
+            (self._document(position), float(distance))
+            for position, distance in zip(positions[0], distances[0])
+        ]
+
+    def similarity_search_by_vectors_with_score(self, embeddings, k=4):
+        """Top-k (document, distance) pairs for many query embeddings in one matrix search."""
+        positions, distances = self.search(embeddings, k)
+        return [
+            [(self._document(position), float(distance))
+             for position, distance in zip(row_positions, row_distances)]
+            for row_positions, row_distances in zip(positions, distances)
+        ]
+
+    def similarity_search_with_score(self, query, k=4):
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k)
+
+    def similarity_search(self, query, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def get_by_ids(self, ids):
+        """Return documents for the given chunk ids, skipping unknown ids."""
+        return [
+            self._document(self._positions[chunk_id])
+            for chunk_id in ids if chunk_id in self._positions
+        ]
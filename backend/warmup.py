@@ -0,0 +1,138 @@
+import logging
+import os
+import time
+from datetime import datetime
+from backend import metrics
+from backend import style_guide
+from backend.admission import Deadline, deadline_scope
+from backend.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Set constants
+WARMUP_QUERY = "How should I use dashes?"
+WARMUP_THREAD_ID = "warmup"
+
+
+def load_popular_queries(path):
+    """Queries listed one per line in path, most popular first; [] if there is no file."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def innermost_saver(checkpointer):
+    """The storage-backed saver under any checkpointer wrappers."""
+    while hasattr(checkpointer, "saver"):
+        checkpointer = checkpointer.saver
+    return checkpointer
+
+
+# Priming steps: each returns a detail dict, or None if there was nothing to prime
+def prime_index(primed):
+    collection = style_guide.collection
+    if isinstance(collection, VectorIndex):
+        return {"chunks": len(collection), "bytes_touched": collection.touch()}
+    # Reads one row to open Chroma's SQLite store; the HNSW index is loaded by the search step
+    return {"rows": len(collection.get(limit=1, include=[])["ids"])}
+
+
+def prime_embedding(primed):
+    # Bypass the embedding cache so every ping reaches the Embedding Lambda
+    embeddings = style_guide.collection.embeddings
+    embeddings = getattr(embeddings, "embeddings", embeddings)
+    primed["vector"] = embeddings.embed_query(WARMUP_QUERY)
+    return {"query": WARMUP_QUERY}
+
+
+def prime_search(primed):
+    if "vector" not in primed:
+        return None
+    results = style_guide.search_embeddings([primed["vector"]])
+    return {"results": len(results[0])}
+
+
+def prime_llm(primed):
+    clients = {}
+    for bound in style_guide.llm_with_tools.values():
+        model = getattr(bound, "bound", bound)
+        client = getattr(model, "client", None)
+        if hasattr(client, "invoke_model"):
+            clients[model.model_id] = client
+    if not clients:
+        return None
+    for model_id, client in clients.items():
+        # An empty body is rejected after signing and the TLS handshake, before any tokens are billed
+        try:
+            client.invoke_model(modelId=model_id, body=b"{}")
+        except client.exceptions.ValidationException:
+            pass
+    return {"models": list(clients)}
+
+
+def prime_checkpoints(primed):
+    saver = innermost_saver(style_guide.checkpointer_instance)
+    saver.get_tuple({"configurable": {"thread_id": WARMUP_THREAD_ID}})
+    return {"saver": type(saver).__name__}
+
+
+def prime_usage_table(primed):
+    today = datetime.now().strftime('%Y-%m-%d')
+    style_guide.daily_usage_table.get_item(Key={'usage_date': today})
+    return {"table": style_guide.daily_usage_table.name}
+
+
+def prime_popular_queries(primed):
+    queries = primed["queries"]
+    if not queries:
+        return None
+    style_guide.collection.embeddings.embed_queries(queries)
+    return {"queries": len(queries)}
+
+
+PRIMING_STEPS = [
+    ("index", prime_index),
+    ("embedding", prime_embedding),
+    ("search", prime_search),
+    ("llm", prime_llm),
+    ("checkpoints", prime_checkpoints),
+    ("usage_table", prime_usage_table),
+    ("popular_queries", prime_popular_queries),
+]
+
+
+def prime(budget_seconds, queries=()):
+    """Warm every downstream a query touches, within a time budget.
+
+    Loads and page-touches the index, opens pooled connections to the
+    Embedding Lambda, Bedrock and DynamoDB, and pre-embeds `queries` into
+    the embedding cache. Steps run in order; once the budget is spent the
+    remaining steps are skipped. A failing step is reported, not raised.
+    Returns {"seconds": ..., "steps": {name: {"status": ..., ...}}}.
+    """
+    start = time.perf_counter()
+    deadline = Deadline(budget_seconds)
+    primed = {"queries": list(queries)}
+    steps = {}
+    with deadline_scope(deadline):
+        for name, step in PRIMING_STEPS:
+            if deadline.remaining() <= 0:
+                steps[name] = {"status": "skipped", "reason": "budget"}
+                continue
+            step_start = time.perf_counter()
+            try:
+                detail = step(primed)
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+                detail = {"status": "failed", "error": str(e)}
+            else:
+                detail = {"status": "skipped"} if detail is None else {"status": "primed", **detail}
+            seconds = time.perf_counter() - step_start
+            metrics.observe(f"warmup.{name}", seconds)
+            steps[name] = {**detail, "seconds": round(seconds, 3)}
+
+    report = {"seconds": round(time.perf_counter() - start, 3), "steps": steps}
+    primed_steps = [name for name, step in steps.items() if step["status"] == "primed"]
+    logger.info(f"Warm-up primed {', '.join(primed_steps) or 'nothing'} in {report['seconds']}s")
+    return report
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import math
+import statistics
+import time
+import uuid
+import httpx
+from backend import style_guide
+from backend.admission import AdmissionController
+from backend.main import app
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.admission_control
+# Sends a burst of concurrent /bot/query requests at fake backends whose LLM
+# is slow and sometimes throttles, with and without the admission controller.
+BURST = 80
+EMBED_LATENCY = 0.05
+LLM_LATENCY = 0.6
+FAIL_RATE = 0.2
+DEADLINE = 4.0
+MAX_CONCURRENCY = 8
+MAX_QUEUE = 8
+QUEUE_TIMEOUT = 2.0
+
+
+def fresh_backends(admission):
+    style_guide.pipeline_mode = "single_call"
+    style_guide.coalescing = False
+    style_guide.limiter.enabled = False
+    style_guide.verify_recaptcha = lambda token: True
+    style_guide.get_daily_query_count = lambda: 0
+    style_guide.increment_daily_query_count = lambda amount=1: None
+    style_guide.request_deadline = DEADLINE
+    style_guide.admission = admission
+    _, llm, _ = install_fake_backends(style_guide, embed_latency=EMBED_LATENCY,
+                                      llm_latency=LLM_LATENCY)
+    llm.fail_rate = FAIL_RATE
+    return llm
+
+
+async def send(client, i):
+    start = time.perf_counter()
+    response = await client.post("/bot/query", json={
+        "query": f"How should I format dashes in case {i}?",
+        "session_id": f"bench-{uuid.uuid4()}",
+        "recaptcha_token": "bench",
+    })
+    return response.status_code, time.perf_counter() - start, response.headers.get("retry-after")
+
+
+async def burst(admission):
+    llm = fresh_backends(admission)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(send(client, i) for i in range(BURST)))
+        total = time.perf_counter() - start
+    return results, total, llm.failures
+
+
+def summarize(name, results, total, failures):
+    by_status = {}
+    for status, latency, _ in results:
+        by_status.setdefault(status, []).append(latency)
+    for status, latencies in sorted(by_status.items()):
+        latencies.sort()
+        p95 = latencies[math.ceil(0.95 * len(latencies)) - 1]
+        print(f"{name:>12} {status:>6} {len(latencies):>6} "
+              f"{statistics.median(latencies):>8.2f} {p95:>8.2f}")
+    retry_after = sorted({int(r) for status, _, r in results if status == 503 and r})
+    print(f"{'':>12} burst took {total:.2f} s, {failures} throttled LLM calls, "
+          f"Retry-After values {retry_after or '-'}")
+
+
+async def main():
+    # Per-request deadline and retry warnings would drown the table
+    logging.getLogger("backend").setLevel(logging.ERROR)
+    print(f"{BURST} concurrent queries, {LLM_LATENCY * 1000:.0f} ms per LLM call, "
+          f"{FAIL_RATE:.0%} throttled, {DEADLINE:.0f} s deadline")
+    print(f"admission: {MAX_CONCURRENCY} in flight, {MAX_QUEUE} queued, "
+          f"{QUEUE_TIMEOUT:.0f} s queue timeout")
+    print("=" * 52)
+    print(f"{'mode':>12} {'status':>6} {'count':>6} {'p50 s':>8} {'p95 s':>8}")
+    print("-" * 52)
+    summarize("unbounded", *await burst(None))
+    summarize("admission", *await burst(
+        AdmissionController(MAX_CONCURRENCY, MAX_QUEUE, QUEUE_TIMEOUT)
+    ))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
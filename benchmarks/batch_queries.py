@@ -0,0 +1,85 @@
+import asyncio
+import json
+import time
+import uuid
+from fastapi.testclient import TestClient
+from backend import style_guide
+from backend.main import app
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.batch_queries
+# Compares answering an editorial checklist one /query at a time with the
+# batch path (one embedding call, one matrix search, bounded LLM concurrency).
+QUESTIONS = [
+    f"How should I handle {topic.lower()} in {place}?"
+    for topic in ("Dashes", "Quotation marks", "Capital letters", "Italics", "Dates and numbers",
+                  "Abbreviations", "Contractions", "Lists", "Section headings", "Units of measurement")
+    for place in ("article titles", "body text", "captions")
+]
+EMBED_LATENCY = 0.1
+LLM_LATENCY = 0.5
+
+
+def fresh_backends():
+    style_guide.pipeline_mode = "single_call"
+    style_guide.coalescing = False
+    return install_fake_backends(style_guide, embed_latency=EMBED_LATENCY, llm_latency=LLM_LATENCY)
+
+
+async def serial():
+    embeddings, llm, _ = fresh_backends()
+    start = time.perf_counter()
+    first = None
+    for query in QUESTIONS:
+        config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+        await style_guide.run_pipeline(query, config)
+        first = first or time.perf_counter() - start
+    return time.perf_counter() - start, first, embeddings.calls, len(llm.calls)
+
+
+async def batch(concurrency):
+    embeddings, llm, _ = fresh_backends()
+    start = time.perf_counter()
+    first = None
+    answered = 0
+    async for index, retrieved, error in style_guide.run_batch(QUESTIONS, concurrency):
+        assert error is None and retrieved["messages"][0].content == QUESTIONS[index]
+        first = first or time.perf_counter() - start
+        answered += 1
+    assert answered == len(QUESTIONS)
+    return time.perf_counter() - start, first, embeddings.calls, len(llm.calls)
+
+
+def check_endpoint():
+    """Stream a batch through /bot/query/batch with a nearly used-up daily quota."""
+    fresh_backends()
+    charged = []
+    style_guide.verify_recaptcha = lambda token: True
+    style_guide.get_daily_query_count = lambda: style_guide.DAILY_QUERY_LIMIT - 4
+    style_guide.increment_daily_query_count = lambda amount=1: charged.append(amount)
+    client = TestClient(app)
+    with client.stream("POST", "/bot/query/batch",
+                       json={"questions": QUESTIONS[:6], "recaptcha_token": "bench"}) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    limited = sum(1 for line in lines if line["answer"].startswith("Query limit"))
+    print(f"POST /bot/query/batch with 4 queries left today: {len(lines)} lines, "
+          f"{limited} over quota, daily count charged {sum(charged)}")
+
+
+async def main():
+    print(f"{len(QUESTIONS)} questions, {EMBED_LATENCY * 1000:.0f} ms per embedding call, "
+          f"{LLM_LATENCY * 1000:.0f} ms per LLM call")
+    print("=" * 72)
+    print(f"{'mode':>16} {'total s':>8} {'first s':>8} {'embed calls':>12} {'LLM calls':>10}")
+    print("-" * 72)
+    rows = [("serial /query", await serial())]
+    for concurrency in (4, 8):
+        rows.append((f"batch, conc={concurrency}", await batch(concurrency)))
+    for name, (total, first, embeds, llm_calls) in rows:
+        print(f"{name:>16} {total:>8.2f} {first:>8.2f} {embeds:>12} {llm_calls:>10}")
+    print()
+    check_endpoint()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+import asyncio
+import time
+import uuid
+from backend import style_guide
+from backend.checkpointing import WriteBehindCheckpointer
+from benchmarks.fakes import SlowCheckpointer, install_fake_backends
+
+# Run from the repository root: python -m benchmarks.checkpoint_io
+# Counts checkpointer round trips per conversation turn, with and without the
+# write-behind cache, against a fake saver with DynamoDB-like latency. Then
+# alternates one session's turns between two cached "containers" sharing the
+# store and checks no turn is lost.
+SESSIONS = 5
+TURNS = 4
+STORE_LATENCY = 0.015
+QUERIES = ["How do I use dashes?", "What about en dashes in ranges?",
+           "And quotation marks?", "Should titles be italicized?"]
+
+
+def cached(store, lease_seconds):
+    return WriteBehindCheckpointer(store, lease_seconds=lease_seconds,
+                                   latest_id=store.latest_checkpoint_id)
+
+
+async def conversation(mode, lease_seconds):
+    style_guide.pipeline_mode = mode
+    style_guide.coalescing = False
+    store = SlowCheckpointer(latency=STORE_LATENCY)
+    checkpointer = store if lease_seconds is None else cached(store, lease_seconds)
+    install_fake_backends(style_guide, checkpointer=checkpointer)
+
+    turn_times = []
+    configs = [{"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}} for _ in range(SESSIONS)]
+    for config in configs:
+        for query in QUERIES[:TURNS]:
+            start = time.perf_counter()
+            await style_guide.run_pipeline(query, config)
+            await style_guide.flush_checkpoints(config)
+            turn_times.append(time.perf_counter() - start)
+
+    # History must be intact in the underlying store, not just in memory
+    for config in configs:
+        history = store.get_tuple(config).checkpoint["channel_values"]["messages"]
+        assert sum(1 for message in history if message.type == "human") == TURNS
+    turns = SESSIONS * TURNS
+    return ((store.read_calls - SESSIONS) / turns, store.version_checks / turns,
+            store.write_calls / turns, sum(turn_times) / turns)
+
+
+async def alternating_containers(lease_seconds):
+    """Run turns of one session on containers A, B, A, B; return the stored human turns."""
+    style_guide.pipeline_mode = "agent"
+    style_guide.coalescing = False
+    store = SlowCheckpointer()
+    containers = [cached(store, lease_seconds), cached(store, lease_seconds)]
+    _, llm, _ = install_fake_backends(style_guide, checkpointer=containers[0])
+    config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+    for turn, query in enumerate(QUERIES[:TURNS]):
+        style_guide.build_assistant(llm, containers[turn % 2])
+        await style_guide.run_pipeline(query, config)
+        await style_guide.flush_checkpoints(config)
+    history = store.get_tuple(config).checkpoint["channel_values"]["messages"]
+    return [message.content for message in history if message.type == "human"]
+
+
+async def main():
+    print(f"Checkpoint I/O per turn ({SESSIONS} sessions x {TURNS} turns, "
+          f"{STORE_LATENCY * 1000:.0f} ms per store call)")
+    print("=" * 72)
+    print(f"{'mode':>12} {'cache':>14} {'reads':>7} {'checks':>7} {'writes':>7} {'turn ms':>9}")
+    print("-" * 72)
+    for mode in ("agent", "single_call"):
+        for lease_seconds in (None, 0, 30):
+            reads, checks, writes, turn_time = await conversation(mode, lease_seconds)
+            label = "off" if lease_seconds is None else f"on, lease {lease_seconds}s"
+            print(f"{mode:>12} {label:>14} {reads:>7.1f} {checks:>7.1f} {writes:>7.1f} "
+                  f"{turn_time * 1000:>9.1f}")
+
+    for lease_seconds in (0, 30):
+        stored = await alternating_containers(lease_seconds)
+        print(f"\nturns on containers A, B, A, B (lease {lease_seconds}s): "
+              f"{len(stored)} of {TURNS} stored")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+import asyncio
+import time
+import uuid
+from langchain.tools import tool
+from backend import style_guide
+from backend.checkpointing import STALE_CONTEXT, ChunkIdCheckpointer
+from benchmarks.fakes import SlowCheckpointer, install_fake_backends
+
+# Run from the repository root: python -m benchmarks.checkpoint_size
+# Measures stored checkpoint bytes and store latency over one long session,
+# comparing the old tool artifact (full Documents), ids without slimming,
+# and ids with ChunkIdCheckpointer, then checks that a reindex hides old
+# turns' context instead of rendering other chunks under their ids.
+TURNS = 12
+STORE_LATENCY = 0.010
+STORE_LATENCY_PER_KB = 0.0005
+QUERIES = ["How do I use dashes?", "What about en dashes in ranges?", "And quotation marks?",
+           "Should titles be italicized?", "How are dates written?", "When are serial commas used?"]
+
+
+@tool(response_format="content_and_artifact")
+def legacy_retrieve_context(query: str):
+    """Retrieve information from style guide to help answer a query."""
+    retrieved_docs = [doc for doc, _ in style_guide.retrieve_scored(query)]
+    return style_guide.serialize_docs(retrieved_docs), retrieved_docs
+
+
+async def session(variant):
+    current_tool = style_guide.retrieve_context
+    if variant == "documents":
+        legacy_retrieve_context.name = "retrieve_context"
+        style_guide.retrieve_context = legacy_retrieve_context
+    store = SlowCheckpointer(latency=STORE_LATENCY, latency_per_kb=STORE_LATENCY_PER_KB)
+    checkpointer = store
+    if variant == "ids+slim":
+        checkpointer = ChunkIdCheckpointer(store, style_guide.render_chunks)
+    style_guide.pipeline_mode = "agent"
+    style_guide.coalescing = False
+    try:
+        install_fake_backends(style_guide, checkpointer=checkpointer)
+        checkpointer.collection_version = style_guide.collection_version
+        config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+        start = time.perf_counter()
+        for i in range(TURNS):
+            await style_guide.run_pipeline(QUERIES[i % len(QUERIES)], config)
+        turn_time = (time.perf_counter() - start) / TURNS
+    finally:
+        style_guide.retrieve_context = current_tool
+
+    final_size = store._size(store.get_tuple(config).checkpoint)
+    start = time.perf_counter()
+    history = style_guide.load_history(config)
+    read_time = time.perf_counter() - start
+    # Rehydrated history must still carry the chunk text for the model
+    tool_messages = [message for message in history if message.type == "tool"]
+    assert len(tool_messages) == TURNS and all("Content:" in m.content for m in tool_messages)
+    response = style_guide.clean_retrieved({"messages": history})
+    source = response["sources"][0]
+    assert source.get("content") or style_guide.get_chunks([source["id"]])
+    stale = None
+    if variant == "ids+slim":
+        # The same thread read after a reindex
+        checkpointer.collection_version = "reindexed"
+        stale = sum(1 for m in style_guide.load_history(config)
+                    if m.type == "tool" and m.content == STALE_CONTEXT and not m.artifact)
+    return store.bytes_written / TURNS, final_size, turn_time, read_time, stale
+
+
+async def main():
+    print(f"Checkpoint size over a {TURNS}-turn session "
+          f"({STORE_LATENCY * 1000:.0f} ms + {STORE_LATENCY_PER_KB * 1000:.1f} ms/KB per store call)")
+    print("=" * 80)
+    print(f"{'artifact':>12} {'KB written/turn':>16} {'final checkpoint KB':>20} "
+          f"{'turn ms':>9} {'read ms':>9}")
+    print("-" * 80)
+    for variant in ("documents", "ids", "ids+slim"):
+        per_turn, final_size, turn_time, read_time, stale = await session(variant)
+        print(f"{variant:>12} {per_turn / 1024:>16.1f} {final_size / 1024:>20.1f} "
+              f"{turn_time * 1000:>9.1f} {read_time * 1000:>9.1f}")
+    print(f"\nafter a reindex: {stale} of {TURNS} stored retrievals shown as stale, not re-rendered")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import time
+import uuid
+from backend import metrics, style_guide
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.coalescing
+# Fires a burst of identical first-turn questions (with small variations in
+# case and spacing) from distinct sessions and counts backend calls.
+BURST = 50
+QUERIES = ["How do I format quotations?", "how do I format  quotations", "How do I format quotations?!"]
+
+
+async def burst(mode, enabled):
+    style_guide.pipeline_mode = mode
+    style_guide.coalescing = enabled
+    embeddings, llm, _ = install_fake_backends(style_guide, embed_latency=0.1, llm_latency=0.5)
+    metrics.reset()
+    configs = [{"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}} for _ in range(BURST)]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        style_guide.run_pipeline(QUERIES[i % len(QUERIES)], config)
+        for i, config in enumerate(configs)
+    ])
+    elapsed = time.perf_counter() - start
+
+    # Every session must end up with its own answer and sources, and history
+    for config, retrieved in zip(configs, results):
+        response = style_guide.clean_retrieved(retrieved)
+        assert response["answer"] and response["sources"]
+        assert style_guide.load_history(config)
+    counters = metrics.snapshot()["counters"]
+    return (elapsed, embeddings.calls, counters.get("coalesce.retrieval.executed", BURST),
+            len(llm.calls), counters.get("coalesce.first_turn.shared", 0))
+
+
+async def main():
+    print(f"Coalescing {BURST} concurrent identical first-turn queries")
+    print("=" * 80)
+    print(f"{'mode':>12} {'coalescing':>11} {'wall s':>7} {'embeds':>7} {'searches':>9} "
+          f"{'LLM calls':>10} {'shared':>7}")
+    print("-" * 80)
+    for mode in ("agent", "single_call"):
+        for enabled in (False, True):
+            elapsed, embeds, searches, llm_calls, shared = await burst(mode, enabled)
+            print(f"{mode:>12} {'on' if enabled else 'off':>11} {elapsed:>7.2f} {embeds:>7} "
+                  f"{searches:>9} {llm_calls:>10} {shared:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
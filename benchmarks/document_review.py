@@ -0,0 +1,64 @@
+import asyncio
+import time
+import tracemalloc
+import numpy as np
+from backend import style_guide
+from backend.document_review import SENTENCE_END
+from benchmarks.fakes import TOPICS, install_fake_backends
+
+# Run from the repository root: python -m benchmarks.document_review
+# Reviews synthetic documents of increasing length and reports segments,
+# embedding calls, latency, peak traced memory and prompt size.
+WORD_COUNTS = [500, 2000, 8000]
+EMBED_LATENCY = 0.1
+LLM_LATENCY = 0.5
+FILLER = "the article says that editors should write this text in a clear way for readers".split()
+
+
+def synthetic_document(words, seed=0):
+    """Paragraphs of 8-25 word sentences, each mentioning a random MoS topic."""
+    rng = np.random.default_rng(seed)
+    sentences, count = [], 0
+    while count < words:
+        length = int(rng.integers(8, 26))
+        sentence = list(rng.choice(FILLER, size=length - 2)) + TOPICS[rng.integers(len(TOPICS))].lower().split()
+        sentences.append(" ".join(sentence).capitalize() + ".")
+        count += len(sentence)
+    paragraphs = [" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)]
+    return "\n\n".join(paragraphs)
+
+
+async def review(words):
+    embeddings, llm, _ = install_fake_backends(style_guide, embed_latency=EMBED_LATENCY,
+                                               llm_latency=LLM_LATENCY)
+    text = synthetic_document(words)
+    tracemalloc.start()
+    start = time.perf_counter()
+    retrieved, segments = await style_guide.run_review(text)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response = style_guide.clean_retrieved(retrieved)
+    assert response["answer"] and response["sources"]
+    sentences = len(SENTENCE_END.split(text))
+    input_tokens = sum(len(str(m.content)) + len(str(getattr(m, "tool_calls", "")))
+                       for m in llm.calls[-1]["messages"]) // 4
+    return (len(text), sentences, segments, embeddings.calls, len(response["sources"]),
+            len(llm.calls), input_tokens, elapsed, peak)
+
+
+async def main():
+    print(f"Document review ({EMBED_LATENCY * 1000:.0f} ms per embedding call, "
+          f"{LLM_LATENCY * 1000:.0f} ms per LLM call)")
+    print("=" * 104)
+    print(f"{'words':>6} {'chars':>7} {'sentences':>10} {'segments':>9} {'embed calls':>12} "
+          f"{'rules':>6} {'LLM calls':>10} {'prompt tok':>11} {'total s':>8} {'peak MB':>8}")
+    print("-" * 104)
+    for words in WORD_COUNTS:
+        chars, sentences, segments, embeds, rules, llm_calls, tokens, elapsed, peak = await review(words)
+        print(f"{words:>6} {chars:>7} {sentences:>10} {segments:>9} {embeds:>12} {rules:>6} "
+              f"{llm_calls:>10} {tokens:>11} {elapsed:>8.2f} {peak / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
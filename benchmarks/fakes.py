@@ -0,0 +1,244 @@
+import functools
+import hashlib
+import random
+import re
+import threading
+import time
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.checkpoint.memory import InMemorySaver
+from backend.vector_index import VectorIndex
+
+# Offline stand-ins for the Embedding Lambda, Bedrock and DynamoDB used by the
+# benchmark scripts. Latencies are simulated with time.sleep.
+EMBEDDING_DIMENSIONS = 1536
+TOPICS = [
+    "Dashes", "Quotation marks", "Capital letters", "Italics", "Dates and numbers",
+    "National varieties of English", "Abbreviations", "Contractions", "Lists",
+    "Section headings", "Pronouns", "Foreign terms", "Units of measurement",
+    "Serial commas", "Article titles", "Gender-neutral language",
+]
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_vector(word, dimensions):
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    return np.random.default_rng(seed).normal(size=dimensions).astype(np.float32)
+
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words embeddings, so shared words mean closer vectors."""
+
+    def __init__(self, latency=0.0, dimensions=EMBEDDING_DIMENSIONS):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        words = {word.rstrip("s") for word in re.findall(r"[a-z]+", text.lower())} or {text}
+        vector = np.sum([_word_vector(word, self.dimensions) for word in words], axis=0)
+        return vector / np.linalg.norm(vector)
+
+    def embed_query(self, text):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+
+def _has_marker(content):
+    return isinstance(content, list) and any(
+        isinstance(block, dict) and "cache_control" in block for block in content
+    )
+
+
+def cache_markers(call):
+    """Where a recorded FakeChatModel call carried cache_control markers."""
+    markers = []
+    for i, message in enumerate(call["messages"]):
+        if _has_marker(message.content):
+            markers.append("system" if message.type == "system" else f"{message.type}[{i}]")
+    return markers
+
+
+class ThrottlingException(Exception):
+    """Stand-in for Bedrock's transient throttling error."""
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that calls retrieve_context once per turn, then answers.
+
+    Every request is recorded in `calls` (messages plus bound kwargs such as
+    tools), so cache markers and tool schemas can be inspected offline.
+    Prompt caching is simulated: a prefix ending at a cache marker is
+    reported as a cache write the first time and a cache read afterwards.
+    With `fail_rate` set, that share of calls raise ThrottlingException
+    after the usual latency.
+    """
+
+    latency: float = 0.0
+    answer: str = "Use an unspaced em dash or a spaced en dash, consistently."
+    model_name: str = "fake-model"
+    fail_rate: float = 0.0
+    failures: int = 0
+    calls: list = []
+    cached_prefixes: set = set()
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        # Like ChatBedrock, only the schema is sent; tool extras are dropped
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _cache_usage(self, messages, tools):
+        """Return (cache_read, cache_creation) token counts for a request."""
+        # Tools come first in the cached prefix but carry no breakpoint of their own
+        prefix = str(tools)
+        breakpoints = []
+        for message in messages:
+            prefix += message.type + message.text + str(getattr(message, "tool_calls", ""))
+            if _has_marker(message.content):
+                breakpoints.append(prefix)
+
+        cache_read = cache_creation = 0
+        for prefix in breakpoints:
+            key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+            if key in self.cached_prefixes:
+                cache_read = len(prefix) // 4
+            else:
+                self.cached_prefixes.add(key)
+                cache_creation = len(prefix) // 4 - cache_read
+        return cache_read, cache_creation
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls.append({"messages": list(messages), "kwargs": kwargs})
+        time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self.failures += 1
+            raise ThrottlingException("Rate exceeded")
+
+        last_human = max(i for i, message in enumerate(messages) if message.type == "human")
+        has_context = any(message.type == "tool" for message in messages[last_human:])
+        if has_context:
+            message = AIMessage(content=self.answer)
+        else:
+            message = AIMessage(content="", tool_calls=[{
+                "name": "retrieve_context",
+                "args": {"query": messages[last_human].text},
+                "id": f"call_{len(self.calls)}",
+                "type": "tool_call",
+            }])
+        tools = kwargs.get("tools") or []
+        input_tokens = (len(str(tools)) + sum(len(str(m.content)) for m in messages)) // 4
+        output_tokens = max(len(message.text) // 4, 10)
+        cache_read, cache_creation = self._cache_usage(messages, tools)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cache_read, "cache_creation": cache_creation},
+        }
+        message.response_metadata = {"model_name": self.model_name}
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def fake_index(embeddings, chunks=200):
+    """Synthetic MoS-like corpus embedded with `embeddings`."""
+    ids = [f"chunk_{i}" for i in range(chunks)]
+    titles = [TOPICS[i % len(TOPICS)] for i in range(chunks)]
+    documents = [
+        f"{title} guidance, part {i}. " + "Style guide text. " * 40
+        for i, title in enumerate(titles)
+    ]
+    metadatas = [
+        {"title": title, "level": 3, "parent": "Punctuation", "shortcuts": ""}
+        for title in titles
+    ]
+    vectors = embeddings.embed_documents(documents)
+    embeddings.calls = 0
+    return VectorIndex.from_embeddings(
+        ids, vectors, documents, metadatas, embedding_function=embeddings
+    )
+
+
+def install_fake_backends(style_guide, embed_latency=0.0, llm_latency=0.0, checkpointer=None,
+                          routing=False):
+    """Point the backend globals at fake embeddings, LLM(s) and checkpointer.
+
+    With routing=True a second, faster FakeChatModel is installed as the
+    router's fast model. Returns the (embeddings, llm, checkpointer) fakes
+    for inspection.
+    """
+    embeddings = FakeEmbeddings(latency=embed_latency)
+    llm = FakeChatModel(latency=llm_latency, model_name="fake-large")
+    fast_llm = FakeChatModel(latency=llm_latency / 3, model_name="fake-fast") if routing else None
+    checkpointer = checkpointer or InMemorySaver()
+    style_guide.collection = fake_index(embeddings)
+    style_guide.collection.embedding_function = style_guide.CachedEmbeddings(embeddings)
+    style_guide.collection_version = style_guide.collection.version
+    style_guide.build_assistant(llm, checkpointer, fast_llm)
+    return embeddings, llm, checkpointer
+
+
+class SlowCheckpointer(InMemorySaver):
+    """InMemorySaver with DynamoDB-like latency, call counts and stored bytes.
+
+    Each call costs `latency` plus `latency_per_kb` for every KB of
+    serialized checkpoint or writes it stores or returns.
+    """
+
+    def __init__(self, latency=0.0, latency_per_kb=0.0):
+        super().__init__()
+        self.latency = latency
+        self.latency_per_kb = latency_per_kb
+        self.read_calls = 0
+        self.write_calls = 0
+        self.version_checks = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def _size(self, value):
+        return len(self.serde.dumps_typed(value)[1])
+
+    def latest_checkpoint_id(self, thread_id, checkpoint_ns=""):
+        """Key-only lookup of the newest checkpoint id, like a projected DynamoDB query."""
+        self.version_checks += 1
+        time.sleep(self.latency)
+        checkpoint_tuple = super().get_tuple(
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+        )
+        return checkpoint_tuple.config["configurable"]["checkpoint_id"] if checkpoint_tuple else None
+
+    def get_tuple(self, config):
+        self.read_calls += 1
+        checkpoint_tuple = super().get_tuple(config)
+        size = self._size(checkpoint_tuple.checkpoint) if checkpoint_tuple else 0
+        self.bytes_read += size
+        time.sleep(self.latency + self.latency_per_kb * size / 1024)
+        return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.write_calls += 1
+        size = self._size(checkpoint)
+        self.bytes_written += size
+        time.sleep(self.latency + self.latency_per_kb * size / 1024)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.write_calls += 1
+        size = self._size(list(writes))
+        self.bytes_written += size
+        time.sleep(self.latency + self.latency_per_kb * size / 1024)
+        return super().put_writes(config, writes, task_id, task_path)
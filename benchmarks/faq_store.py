@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import statistics
+import tempfile
+import time
+import uuid
+from backend import style_guide
+from backend.faq_store import load_faq_store
+from benchmarks.fakes import install_fake_backends
+from data_processing.build_faq_store import build_store
+
+# Run from the repository root: python -m benchmarks.faq_store
+# Builds an FAQ store with the offline job's build_store over fake backends,
+# then replays first-turn traffic: canonical questions with different casing
+# and punctuation (exact matches), reworded ones (embedding-near matches) and
+# questions outside the store, counting LLM and embedding calls.
+LLM_LATENCY = 0.4
+EMBED_LATENCY = 0.02
+TOPICS = ["dashes", "quotation marks", "capital letters", "italics", "dates",
+          "abbreviations", "contractions", "lists", "section headings", "units of measurement"]
+CANONICAL = [f"How should I format {topic} in article text?" for topic in TOPICS]
+EXACT = [question.upper().rstrip("?") + "!" for question in CANONICAL]
+REWORDED = [f"Exactly how should I format {topic} in article text" for topic in TOPICS]
+NOVEL = [f"Is it acceptable to use {topic} in a caption?" for topic in TOPICS]
+
+
+def fresh_backends(mode="agent"):
+    style_guide.pipeline_mode = mode
+    style_guide.faq_store = None
+    return install_fake_backends(style_guide, embed_latency=EMBED_LATENCY,
+                                 llm_latency=LLM_LATENCY)[:2]
+
+
+async def replay(queries):
+    """Mean seconds per first-turn query, each in a new session."""
+    timings = []
+    for query in queries:
+        config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+        start = time.perf_counter()
+        await style_guide.run_pipeline(query, config)
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings)
+
+
+async def main():
+    logging.getLogger("backend").setLevel(logging.ERROR)
+    directory = tempfile.mkdtemp(prefix="faq-store-")
+
+    _, llm = fresh_backends()
+    start = time.perf_counter()
+    (await build_store(CANONICAL)).save(directory)
+    print(f"built {len(CANONICAL)} entries in {time.perf_counter() - start:.2f}s "
+          f"({len(llm.calls)} LLM calls)")
+    print("=" * 76)
+    print(f"{'mode':>12} {'traffic':>10} {'store':>6} {'mean ms':>9} {'LLM calls':>10} "
+          f"{'embeds':>7} {'served':>7}")
+    print("-" * 76)
+    for mode in ("agent", "single_call"):
+        for name, queries in (("exact", EXACT), ("reworded", REWORDED), ("novel", NOVEL)):
+            for use_store in (False, True):
+                embeddings, llm = fresh_backends(mode)
+                if use_store:
+                    style_guide.faq_store = load_faq_store(directory, style_guide.collection_version)
+                served = style_guide.metrics.snapshot()["counters"].get("faq.served", 0)
+                mean = await replay(queries)
+                served = style_guide.metrics.snapshot()["counters"].get("faq.served", 0) - served
+                print(f"{mode:>12} {name:>10} {'on' if use_store else 'off':>6} {mean * 1000:>9.1f} "
+                      f"{len(llm.calls):>10} {embeddings.calls:>7} {served:>7}")
+
+    # Follow-ups in a session answered from the store still go to the agent
+    _, llm = fresh_backends()
+    style_guide.faq_store = load_faq_store(directory, style_guide.collection_version)
+    config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+    await style_guide.run_pipeline(EXACT[0], config)
+    retrieved = await style_guide.run_pipeline(CANONICAL[1], config)
+    print(f"\nfollow-up after an FAQ answer: {len(llm.calls)} LLM calls, "
+          f"{sum(1 for m in retrieved['messages'] if m.type == 'human')} human turns in history")
+    stale = load_faq_store(directory, "some-other-collection-version")
+    print(f"store loaded against a different collection version: {stale}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
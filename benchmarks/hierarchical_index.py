@@ -0,0 +1,86 @@
+import time
+import numpy as np
+from backend import metrics
+from backend.vector_index import HIERARCHY_MIN_CHUNKS, VectorIndex
+
+# Run from the repository root: python -m benchmarks.hierarchical_index
+# Compares flat and two-stage (section centroid) search on synthetic
+# clustered corpora: each level-2 heading has level-3 subsections whose
+# chunks share the heading's and the subsection's direction plus noise.
+SCALES = [1_000, 10_000, 100_000]
+DIMENSIONS = 512
+CHUNKS_PER_SECTION = 10
+SUBSECTIONS = 4
+QUERIES = 200
+K = 3
+SECTION_SETTINGS = [4, 8, 16]
+CHUNK_NOISE = 1.5
+QUERY_NOISE = 1.5
+
+
+def unit(rows):
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def synthetic_index(chunks, rng):
+    sections = chunks // CHUNKS_PER_SECTION
+    headings = sections // SUBSECTIONS
+    heading_dirs = unit(rng.normal(size=(headings, DIMENSIONS)))
+    section_dirs = unit(heading_dirs.repeat(SUBSECTIONS, axis=0)
+                        + 0.8 * unit(rng.normal(size=(sections, DIMENSIONS))))
+    vectors = np.empty((chunks, DIMENSIONS), dtype=np.float32)
+    metadatas = []
+    for start in range(0, chunks, 10_000):
+        rows = np.arange(start, min(start + 10_000, chunks))
+        section = rows // CHUNKS_PER_SECTION
+        noise = unit(rng.normal(size=(len(rows), DIMENSIONS)))
+        vectors[rows] = unit(section_dirs[section] + CHUNK_NOISE * noise)
+    for row in range(chunks):
+        section = row // CHUNKS_PER_SECTION
+        metadatas.append({"title": f"Section {section}", "level": 3,
+                          "parent": f"Heading {section // SUBSECTIONS}.{section % SUBSECTIONS}"})
+    ids = [f"chunk_{i}" for i in range(chunks)]
+    index = VectorIndex.from_embeddings(ids, vectors, [""] * chunks, metadatas)
+    queries = unit(vectors[rng.integers(chunks, size=QUERIES)] + QUERY_NOISE * unit(rng.normal(size=(QUERIES, DIMENSIONS))))
+    return index, queries
+
+
+def run(index, queries, search):
+    results, start = [], time.perf_counter()
+    for query in queries:
+        results.append(search([query], K)[0][0])
+    return np.array(results), (time.perf_counter() - start) / len(queries)
+
+
+def recall(results, truth):
+    return np.mean([len(set(r) & set(t)) / K for r, t in zip(results, truth)])
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"Flat vs hierarchical search, {DIMENSIONS} dims float32, recall@{K} vs exact, "
+          f"{QUERIES} single-query searches")
+    print("=" * 80)
+    print(f"{'chunks':>8} {'sections':>9} {'mode':>18} {'ms/query':>9} {'recall@3':>9} {'fallbacks':>10}")
+    print("-" * 80)
+    for chunks in SCALES:
+        index, queries = synthetic_index(chunks, rng)
+        truth, flat_time = run(index, queries, index.search_by_vectors)
+        start = time.perf_counter()
+        index.build_sections()
+        build_time = time.perf_counter() - start
+        sections = len(index.section_keys)
+        print(f"{chunks:>8} {sections:>9} {'flat':>18} {flat_time * 1000:>9.2f} {1.0:>9.3f} {'':>10}")
+        for setting in SECTION_SETTINGS:
+            index.hierarchy_sections = setting
+            metrics.reset()
+            results, hier_time = run(index, queries, index.search)
+            fallbacks = metrics.snapshot()["counters"].get("retrieval.exact_fallbacks", 0)
+            print(f"{chunks:>8} {sections:>9} {f'top {setting} sections':>18} {hier_time * 1000:>9.2f} "
+                  f"{recall(results, truth):>9.3f} {fallbacks:>10}")
+        note = f" (under {HIERARCHY_MIN_CHUNKS} chunks: search stays exact)" if chunks < HIERARCHY_MIN_CHUNKS else ""
+        print(f"{'':>8} centroid build: {build_time:.2f}s{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+import httpx
+from backend import style_guide, warmup
+from backend.main import app
+from benchmarks.fakes import FakeEmbeddings, SlowCheckpointer, install_fake_backends
+
+# Run from the repository root: python -m benchmarks.keep_warm
+# First-request latency in a fresh container, with and without a priming warm
+# ping, against steady state. Each fake downstream pays a one-time connection
+# setup cost on its first call, standing in for TLS, credential resolution and
+# a cold Embedding Lambda. The Bedrock step is not simulated (the fake model
+# has no boto client), so it reports as skipped.
+EMBED_LATENCY = 0.05
+LLM_LATENCY = 0.3
+DYNAMODB_LATENCY = 0.01
+EMBED_SETUP = 0.3
+DYNAMODB_SETUP = 0.15
+POPULAR_QUERIES = [
+    "How do I use an en dash?",
+    "Should I use the serial comma?",
+    "How are dates formatted?",
+]
+
+
+class ColdStart:
+    """One-time setup cost paid by whichever call comes first."""
+
+    def __init__(self, setup):
+        self.setup = setup
+        self._cold = True
+        self._lock = threading.Lock()
+
+    def connect(self):
+        with self._lock:
+            cold, self._cold = self._cold, False
+        if cold:
+            time.sleep(self.setup)
+
+
+class ColdEmbeddings(FakeEmbeddings):
+    def __init__(self, latency):
+        super().__init__(latency=latency)
+        self.cold = ColdStart(EMBED_SETUP)
+
+    def embed_query(self, text):
+        self.cold.connect()
+        return super().embed_query(text)
+
+    def embed_documents(self, texts):
+        self.cold.connect()
+        return super().embed_documents(texts)
+
+
+class ColdCheckpointer(SlowCheckpointer):
+    def __init__(self):
+        super().__init__(latency=DYNAMODB_LATENCY)
+        self.cold = ColdStart(DYNAMODB_SETUP)
+
+    def get_tuple(self, config):
+        self.cold.connect()
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.cold.connect()
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+class ColdUsageTable:
+    """Stand-in for the daily usage DynamoDB table."""
+
+    name = "styleguidebot-daily-usage"
+
+    def __init__(self):
+        self.cold = ColdStart(DYNAMODB_SETUP)
+
+    def get_item(self, Key):
+        self.cold.connect()
+        time.sleep(DYNAMODB_LATENCY)
+        return {}
+
+    def update_item(self, **kwargs):
+        self.cold.connect()
+        time.sleep(DYNAMODB_LATENCY)
+
+
+def fresh_container():
+    style_guide.limiter.enabled = False
+    style_guide.admission = None
+    style_guide.verify_recaptcha = lambda token: True
+    style_guide.daily_usage_table = ColdUsageTable()
+    install_fake_backends(style_guide, llm_latency=LLM_LATENCY, checkpointer=ColdCheckpointer())
+    # Swap in an embedding backend that is cold, behind the usual cache
+    style_guide.collection.embedding_function.embeddings = ColdEmbeddings(EMBED_LATENCY)
+
+
+async def timed_query(client, query):
+    start = time.perf_counter()
+    response = await client.post("/bot/query", json={
+        "query": query, "session_id": f"bench-{uuid.uuid4()}", "recaptcha_token": "bench",
+    })
+    assert response.status_code == 200, response.text
+    return time.perf_counter() - start
+
+
+async def scenario(ping, first_query):
+    """(first request s, steady-state request s, warm ping report or None)."""
+    fresh_container()
+    report = warmup.prime(10.0, POPULAR_QUERIES) if ping else None
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = await timed_query(client, first_query)
+        steady = await timed_query(client, "What is the rule for italics in titles?")
+    return first, steady, report
+
+
+async def main():
+    logging.getLogger("backend").setLevel(logging.ERROR)
+    print(f"setup cost: embedding {EMBED_SETUP * 1000:.0f} ms, "
+          f"each DynamoDB table {DYNAMODB_SETUP * 1000:.0f} ms; LLM {LLM_LATENCY * 1000:.0f} ms")
+    print("=" * 60)
+    print(f"{'container':>28} {'first s':>9} {'steady s':>9}")
+    print("-" * 60)
+    rows = [
+        ("cold, plain ping", False, "How should I hyphenate compound adjectives?"),
+        ("primed", True, "How should I hyphenate compound adjectives?"),
+        ("primed, popular query", True, POPULAR_QUERIES[0]),
+    ]
+    report = None
+    for name, ping, query in rows:
+        first, steady, ping_report = await scenario(ping, query)
+        report = ping_report or report
+        print(f"{name:>28} {first:>9.3f} {steady:>9.3f}")
+    print()
+    print(f"warm ping took {report['seconds']:.3f} s:")
+    for name, step in report["steps"].items():
+        detail = ", ".join(f"{k}={v}" for k, v in step.items() if k not in ("status", "seconds"))
+        print(f"  {name:>16} {step['status']:>8} {step['seconds']:>7.3f} s  {detail}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+import asyncio
+import uuid
+from backend import metrics, style_guide
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.model_routing
+# Offline view of routing decisions for a query mix; thresholds come from the
+# same ROUTER_* environment variables as the backend, except the distance
+# threshold, which is rescaled for the fake bag-of-words embeddings.
+FAKE_MAX_DISTANCE = 1.6
+SESSIONS = [
+    ["MOS:DASH em dash spacing"],
+    ["Oxford comma?"],
+    ["How should I format dates, and do the rules differ for citations versus prose?"],
+    ["Is it okay to use contractions? What about in quotations?"],
+    ["Should there be spaces around an em dash?", "And en dashes?", "In ranges?",
+     "Between dates?", "What about in titles?"],
+]
+
+
+async def main():
+    _, large_llm, _ = install_fake_backends(style_guide, llm_latency=0.6, routing=True)
+    style_guide.router_thresholds.max_distance = FAKE_MAX_DISTANCE
+    for mode in ("agent", "single_call"):
+        style_guide.pipeline_mode = mode
+        metrics.reset()
+        print(f"\n{mode} mode")
+        print("=" * 80)
+        for turns in SESSIONS:
+            config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+            for query_text in turns:
+                calls_before = len(large_llm.calls)
+                await style_guide.run_pipeline(query_text, config)
+                tier = "large" if len(large_llm.calls) > calls_before else "fast"
+                distance = style_guide.top_distance(query_text)
+                print(f"  {tier:>5}  {distance:.2f}  {query_text}")
+
+        snapshot = metrics.snapshot()
+        print("-" * 80)
+        print(f"  decisions: fast={snapshot['counters'].get('router.fast', 0)}, "
+              f"large={snapshot['counters'].get('router.large', 0)}")
+        for tier in ("fast", "large"):
+            timing = snapshot["timings"].get(f"llm.{tier}")
+            if timing:
+                print(f"  {tier} model: {timing['count']} calls, mean {timing['mean']:.2f}s, "
+                      f"max {timing['max']:.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
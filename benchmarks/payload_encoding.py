@@ -0,0 +1,47 @@
+import json
+import os
+import time
+import numpy as np
+
+# The Embedding Lambda builds an OpenAI client at import time
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+
+from embedding_lambda.embedding_lambda import encode_embedding
+from backend.style_guide import decode_embedding
+
+# Run from the repository root: python -m benchmarks.payload_encoding
+DIMENSIONS = 1536
+REPEATS = 2000
+
+# Embeddings come back from OpenAI as float32 values widened to Python floats
+rng = np.random.default_rng(0)
+embedding = (rng.normal(size=DIMENSIONS) / np.sqrt(DIMENSIONS)).astype(np.float32).tolist()
+
+payloads = {
+    "json": {"statusCode": 200, "embedding": embedding},
+}
+for encoding in ("base64-float32", "base64-float16"):
+    payloads[encoding] = {
+        "statusCode": 200,
+        "embedding_b64": encode_embedding(embedding, encoding),
+        "encoding": encoding,
+    }
+
+print("Embedding Lambda Payload Comparison")
+print("=" * 80)
+print(f"{'encoding':>16} {'bytes':>8} {'vs json':>8} {'decode us':>10} {'max abs err':>12}")
+print("-" * 80)
+json_bytes = None
+for encoding, payload in payloads.items():
+    body = json.dumps(payload).encode("utf-8")
+    json_bytes = json_bytes or len(body)
+
+    # Time what LambdaEmbeddings.embed_query does with the Lambda response
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        vector = decode_embedding(json.loads(body))
+    decode_us = (time.perf_counter() - start) * 1e6 / REPEATS
+
+    error = np.max(np.abs(np.asarray(vector, dtype=np.float32) - np.asarray(embedding, dtype=np.float32)))
+    print(f"{encoding:>16} {len(body):>8} {len(body) / json_bytes:>7.1%} "
+          f"{decode_us:>10.1f} {error:>12.2e}")
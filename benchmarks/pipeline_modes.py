@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import time
+import uuid
+from fastapi import FastAPI
+from backend import style_guide
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root:
+#   python -m benchmarks.pipeline_modes          (local .env: OpenAI, Anthropic, DynamoDB)
+#   python -m benchmarks.pipeline_modes --fake   (offline, simulated latencies)
+MODES = ["agent", "single_call"]
+QUERIES = [
+    "Should I use the Oxford comma?",
+    "How do I format quotations?",
+    "When should I capitalize words?",
+    "Should there be spaces around an em dash?",
+    "How do I write dates in articles?",
+    "Should I use American or British spelling?",
+    "When do I use italics for titles of works?",
+    "How do I write numbers, as words or numerals?",
+]
+
+
+async def run_mode(mode):
+    style_guide.pipeline_mode = mode
+    latencies, usages = [], []
+    for query_text in QUERIES:
+        config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+        start = time.perf_counter()
+        retrieved = await style_guide.run_pipeline(query_text, config)
+        latencies.append(time.perf_counter() - start)
+        usages.append(style_guide.turn_usage(retrieved["messages"]))
+        style_guide.clean_retrieved(retrieved)
+        if style_guide.checkpointer_instance is not None:
+            style_guide.checkpointer_instance.delete_thread(config["configurable"]["thread_id"])
+    return latencies, usages
+
+
+async def main(fake):
+    if fake:
+        install_fake_backends(style_guide, embed_latency=0.05, llm_latency=0.8)
+        results = {mode: await run_mode(mode) for mode in MODES}
+    else:
+        async with style_guide.lifespan_mechanism(FastAPI()):
+            results = {mode: await run_mode(mode) for mode in MODES}
+
+    print("Pipeline Mode Comparison")
+    print("=" * 80)
+    print(f"{'mode':>12} {'mean s':>8} {'p50 s':>8} {'max s':>8} "
+          f"{'LLM calls':>10} {'input tok':>10} {'output tok':>11}")
+    print("-" * 80)
+    for mode, (latencies, usages) in results.items():
+        latencies = sorted(latencies)
+        count = len(usages)
+        print(f"{mode:>12} {sum(latencies) / count:>8.2f} {latencies[count // 2]:>8.2f} "
+              f"{latencies[-1]:>8.2f} "
+              f"{sum(u['llm_calls'] for u in usages) / count:>10.2f} "
+              f"{sum(u['input_tokens'] for u in usages) / count:>10.0f} "
+              f"{sum(u['output_tokens'] for u in usages) / count:>11.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare agent and single-call pipelines.")
+    parser.add_argument("--fake", action="store_true", help="Use offline fake backends.")
+    asyncio.run(main(parser.parse_args().fake))
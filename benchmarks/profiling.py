@@ -0,0 +1,87 @@
+import logging
+import statistics
+import tempfile
+import time
+import uuid
+from fastapi.testclient import TestClient
+from backend import style_guide
+from backend.main import app
+from backend.profiling import ProfileSettings, sign_profile_request
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.profiling
+# Per-query latency of /bot/query with profiling off, enabled but not
+# selected, and profiling every request; then one profiled request's report.
+QUERIES = 40
+EMBED_LATENCY = 0.02
+LLM_LATENCY = 0.1
+SECRET = "bench-secret"
+
+
+def fresh_backends(settings):
+    style_guide.limiter.enabled = False
+    style_guide.admission = None
+    style_guide.verify_recaptcha = lambda token: True
+    style_guide.get_daily_query_count = lambda: 0
+    style_guide.increment_daily_query_count = lambda amount=1: None
+    style_guide.profile_settings = settings
+    install_fake_backends(style_guide, embed_latency=EMBED_LATENCY, llm_latency=LLM_LATENCY)
+
+
+def post(client, i, signed=False):
+    headers = {"X-Profile": sign_profile_request(SECRET)} if signed else {}
+    return client.post("/bot/query", headers=headers, json={
+        "query": f"How should I format dashes in case {i}?",
+        "session_id": f"bench-{uuid.uuid4()}",
+        "recaptcha_token": "bench",
+    })
+
+
+def latencies(client, signed=False):
+    timings = []
+    for i in range(QUERIES):
+        start = time.perf_counter()
+        assert post(client, i, signed).status_code == 200
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    logging.getLogger("backend").setLevel(logging.ERROR)
+    directory = tempfile.mkdtemp(prefix="profiles-")
+    client = TestClient(app)
+    rows = [
+        ("off", None, False),
+        ("on, not selected", ProfileSettings(secret=SECRET, directory=directory), False),
+        ("on, signed header", ProfileSettings(secret=SECRET, directory=directory), True),
+    ]
+    print(f"{QUERIES} agent queries, {LLM_LATENCY * 1000:.0f} ms per LLM call, "
+          f"{EMBED_LATENCY * 1000:.0f} ms per embedding")
+    print("=" * 48)
+    print(f"{'profiling':>20} {'mean ms':>9} {'p50 ms':>8} {'max ms':>8}")
+    print("-" * 48)
+    for name, settings, signed in rows:
+        fresh_backends(settings)
+        timings = latencies(client, signed)
+        print(f"{name:>20} {statistics.mean(timings) * 1000:>9.1f} "
+              f"{statistics.median(timings) * 1000:>8.1f} {max(timings) * 1000:>8.1f}")
+
+    fresh_backends(ProfileSettings(secret=SECRET, directory=directory))
+    response = post(client, 0, signed=True)
+    forged = post(client, 1, signed=False).headers.get("Server-Timing")
+    # A query that runs out of time answers with its own 504 response
+    style_guide.request_deadline, deadline = LLM_LATENCY / 2, style_guide.request_deadline
+    timed_out = post(client, 2, signed=True)
+    style_guide.request_deadline = deadline
+    print()
+    print(f"Server-Timing: {response.headers['Server-Timing']}")
+    with open(f"{directory}/{response.headers['X-Profile-File']}", encoding="utf-8") as file:
+        lines = file.readlines()
+    print(f"{response.headers['X-Profile-File']}: {len(lines)} folded stacks, e.g.")
+    print(f"  {max(lines, key=lambda line: int(line.rsplit(' ', 1)[1]))[-160:].strip()}")
+    print(f"unsigned request profiled: {forged is not None}")
+    print(f"{timed_out.status_code} answer profiled: {'Server-Timing' in timed_out.headers}")
+
+
+if __name__ == "__main__":
+    main()
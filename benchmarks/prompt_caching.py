@@ -0,0 +1,43 @@
+import asyncio
+import uuid
+from backend import metrics, style_guide
+from benchmarks.fakes import cache_markers, install_fake_backends
+
+# Run from the repository root: python -m benchmarks.prompt_caching
+# Offline check that cache breakpoints reach the model, in both pipeline modes.
+TURNS = [
+    "Should there be spaces around an em dash?",
+    "What about en dashes in date ranges?",
+    "And hyphens in compound adjectives?",
+    "Does the same apply to article titles?",
+]
+
+
+async def run_session(mode, enabled):
+    style_guide.pipeline_mode = mode
+    style_guide.prompt_caching = enabled
+    _, llm, _ = install_fake_backends(style_guide)
+    metrics.reset()
+    config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+    for query_text in TURNS:
+        await style_guide.run_pipeline(query_text, config)
+    return llm.calls, metrics.snapshot()["counters"]
+
+
+async def main():
+    print("Prompt Caching Check")
+    print("=" * 80)
+    for mode in ("agent", "single_call"):
+        for enabled in (False, True):
+            calls, counters = await run_session(mode, enabled)
+            print(f"\n{mode}, caching {'on' if enabled else 'off'}: {len(calls)} LLM calls, "
+                  f"{counters.get('llm.input_tokens', 0)} input tokens, "
+                  f"{counters.get('llm.cache_read_tokens', 0)} cache read, "
+                  f"{counters.get('llm.cache_write_tokens', 0)} cache write")
+            if enabled:
+                for i, call in enumerate(calls):
+                    print(f"  call {i + 1}: markers on {', '.join(cache_markers(call)) or 'nothing'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+import random
+import statistics
+import time
+import limits
+from limits.storage import MemoryStorage
+from limits.strategies import FixedWindowRateLimiter
+from backend.rate_limiting import LeasedStorage, SQLiteCounters
+
+# Run from the repository root: python -m benchmarks.rate_limiting
+# Added latency per request of the per-IP limit check, for per-container
+# memory storage and for a shared counter store (SQLite with a simulated
+# DynamoDB round trip) with and without local leases. Then checks that
+# several containers sharing one store admit no more than the limit.
+STORE_LATENCY = 0.008
+HOT_HITS = 2000
+COLD_KEYS = 300
+LIMIT = limits.parse("40/hour")
+CONTAINERS = 4
+
+
+class SlowCounters(SQLiteCounters):
+    """SQLite counters with a DynamoDB-like round trip per call."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def add(self, key, amount, expires_at):
+        self.calls += 1
+        time.sleep(STORE_LATENCY)
+        return super().add(key, amount, expires_at)
+
+    def get(self, key):
+        self.calls += 1
+        time.sleep(STORE_LATENCY)
+        return super().get(key)
+
+
+def hit_latencies(limiter, keys):
+    latencies = []
+    for key in keys:
+        start = time.perf_counter()
+        limiter.hit(LIMIT, key, "query")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def measure(name, make_storage):
+    print(f"{name:>26}", end="")
+    for keys in (["10.0.0.1"] * HOT_HITS, [f"10.1.{i // 250}.{i % 250}" for i in range(COLD_KEYS)]):
+        storage, counters = make_storage()
+        latencies = sorted(hit_latencies(FixedWindowRateLimiter(storage), keys))
+        calls = counters.calls * 1000 / len(keys) if counters else 0
+        print(f" {statistics.mean(latencies) * 1000:>8.3f} "
+              f"{latencies[int(0.99 * (len(latencies) - 1))] * 1000:>7.2f} {calls:>7.0f}", end="")
+    print()
+
+
+def memory():
+    return MemoryStorage(), None
+
+
+def shared(max_lease):
+    def make():
+        counters = SlowCounters()
+        return LeasedStorage("sqlite://", counters=counters, max_lease=max_lease), counters
+    return make
+
+
+def check_containers():
+    """Interleave one IP's requests across containers sharing a store."""
+    counters = SQLiteCounters()
+    limiters = [FixedWindowRateLimiter(LeasedStorage("sqlite://", counters=counters))
+                for _ in range(CONTAINERS)]
+    per_container = [FixedWindowRateLimiter(MemoryStorage()) for _ in range(CONTAINERS)]
+    rng = random.Random(0)
+    shared_ok = memory_ok = 0
+    for _ in range(400):
+        container = rng.randrange(CONTAINERS)
+        shared_ok += limiters[container].hit(LIMIT, "10.0.0.1", "query")
+        memory_ok += per_container[container].hit(LIMIT, "10.0.0.1", "query")
+    print(f"400 requests from one IP over {CONTAINERS} containers, limit 40/hour: "
+          f"{memory_ok} admitted with memory://, {shared_ok} with the shared store")
+
+
+def main():
+    print(f"simulated store round trip {STORE_LATENCY * 1000:.0f} ms; "
+          f"hot key: {HOT_HITS} hits from one IP, cold keys: {COLD_KEYS} IPs x 1 hit")
+    print("=" * 82)
+    print(f"{'':>26} {'hot key':^24} {'cold keys':^24}")
+    print(f"{'storage':>26}" + f" {'mean ms':>8} {'p99 ms':>7} {'calls/k':>7}" * 2)
+    print("-" * 82)
+    measure("memory (per container)", memory)
+    measure("shared, no lease", shared(1))
+    measure("shared, leased (max 16)", shared(16))
+    print()
+    check_containers()
+
+
+if __name__ == "__main__":
+    main()
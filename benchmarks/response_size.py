@@ -0,0 +1,104 @@
+import asyncio
+import gzip
+import json
+import os
+import uuid
+import numpy as np
+from fastapi.testclient import TestClient
+
+# Compression is opt-in and configured when backend.main is imported
+os.environ.setdefault("COMPRESS_RESPONSES", "on")
+
+from backend import style_guide
+from backend.main import app
+from benchmarks.fakes import install_fake_backends
+
+# Run from the repository root: python -m benchmarks.response_size
+# Compares bytes sent per query when sources inline their content versus
+# carrying chunk ids, with content fetched once per chunk from /bot/chunks
+# (as the frontend does when every citation is expanded).
+QUERIES = ["How do I use dashes?", "What about en dashes in ranges?", "And em dashes?",
+           "How are quotation marks used?", "Quotation marks inside titles?",
+           "Should titles be italicized?", "Are dashes spaced?", "Italics for foreign terms?"]
+
+
+def prose_like_documents(collection, words_per_chunk=250, seed=0):
+    """Replace the fake corpus' repeated filler with less compressible text."""
+    rng = np.random.default_rng(seed)
+    vocabulary = ["".join(rng.choice(list("etaoinshrdlucmfwyp"), size=rng.integers(2, 9)))
+                  for _ in range(2000)]
+    collection.documents = [
+        document.split(".")[0] + ". " + " ".join(rng.choice(vocabulary, size=words_per_chunk)) + "."
+        for document in collection.documents
+    ]
+
+
+def compressed_size(body):
+    return len(gzip.compress(body))
+
+
+def with_content(response):
+    """The response as it was before sources were served by id, with content inline."""
+    chunks = {doc.id: doc for doc in style_guide.get_chunks([s["id"] for s in response["sources"]])}
+    return {**response, "sources": [{**source, "content": chunks[source["id"]].page_content}
+                                    for source in response["sources"]]}
+
+
+async def session():
+    install_fake_backends(style_guide)
+    prose_like_documents(style_guide.collection)
+    config = {"configurable": {"thread_id": f"bench-{uuid.uuid4()}"}}
+    client = TestClient(app)
+    inline = {"raw": 0, "gzip": 0}
+    by_id = {"raw": 0, "gzip": 0}
+    response_only = {"raw": 0, "gzip": 0}
+    fetched = set()
+    for query in QUERIES:
+        retrieved = await style_guide.run_pipeline(query, config)
+        response = style_guide.clean_retrieved(retrieved)
+        for totals, body in ((inline, with_content(response)), (by_id, response),
+                             (response_only, response)):
+            body = json.dumps(body).encode()
+            totals["raw"] += len(body)
+            totals["gzip"] += compressed_size(body)
+
+        # Fetch only chunks the client has not cached yet
+        missing = [source["id"] for source in response["sources"] if source["id"] not in fetched]
+        if missing:
+            chunks = client.get("/bot/chunks", params={"ids": missing, "v": response["collection_version"]},
+                                headers={"Accept-Encoding": "identity"})
+            by_id["raw"] += len(chunks.content)
+            by_id["gzip"] += compressed_size(chunks.content)
+            fetched.update(missing)
+    return inline, by_id, response_only
+
+
+def check_http_caching():
+    """Exercise ETag revalidation and response compression on /bot/chunks."""
+    client = TestClient(app)
+    chunk_id = style_guide.collection.ids[0]
+    first = client.get(f"/bot/chunks/{chunk_id}", params={"v": style_guide.collection_version})
+    revalidated = client.get(f"/bot/chunks/{chunk_id}", headers={"If-None-Match": first.headers["etag"]})
+    print(f"GET /bot/chunks/{chunk_id}: {first.status_code}, ETag {first.headers['etag']}, "
+          f"Cache-Control '{first.headers['cache-control']}', "
+          f"Content-Encoding {first.headers.get('content-encoding', 'none')}")
+    print(f"Revalidation with If-None-Match: {revalidated.status_code}")
+
+
+async def main():
+    inline, by_id, response_only = await session()
+    turns = len(QUERIES)
+    print(f"Response bytes per query over a {turns}-turn session")
+    print("=" * 64)
+    print(f"{'sources':>24} {'raw bytes':>12} {'gzip bytes':>12}")
+    print("-" * 64)
+    print(f"{'inline content':>24} {inline['raw'] / turns:>12.0f} {inline['gzip'] / turns:>12.0f}")
+    print(f"{'ids, query response only':>24} {response_only['raw'] / turns:>12.0f} "
+          f"{response_only['gzip'] / turns:>12.0f}")
+    print(f"{'ids + /chunks fetches':>24} {by_id['raw'] / turns:>12.0f} {by_id['gzip'] / turns:>12.0f}")
+    print()
+    check_http_caching()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+import multiprocessing
+import statistics
+import tempfile
+import time
+import numpy as np
+from backend import metrics
+from backend.vector_index import ChunkTexts, VectorIndex
+
+# Run from the repository root: python -m benchmarks.shared_index
+# Starts N worker processes that each load the same compact index, either
+# read into private memory or memory-mapped, run searches that fetch chunk
+# texts, then report their memory while all are alive. Summed PSS is what the
+# host actually spends on the workers.
+CHUNKS = 40000
+DIMENSIONS = 512
+WORDS_PER_CHUNK = 220
+SEARCHES = 200
+WORKER_COUNTS = (1, 2, 4)
+MiB = 2 ** 20
+
+
+def build_index(directory):
+    rng = np.random.default_rng(0)
+    vocabulary = np.array([f"word{i}" for i in range(5000)])
+    documents = [" ".join(rng.choice(vocabulary, WORDS_PER_CHUNK)) for _ in range(CHUNKS)]
+    metadatas = [{"title": f"Section {i % 400}", "parent": "Manual of Style", "level": 3}
+                 for i in range(CHUNKS)]
+    vectors = rng.normal(size=(CHUNKS, DIMENSIONS)).astype(np.float32)
+    index = VectorIndex.from_embeddings([f"chunk_{i}" for i in range(CHUNKS)], vectors,
+                                        documents, metadatas)
+    index.save(directory)
+    return index
+
+
+def worker(directory, mmap, barrier, results):
+    baseline = metrics.process_memory()
+    index = VectorIndex.load(directory, mmap=mmap)
+    queries = np.random.default_rng().normal(size=(SEARCHES, DIMENSIONS)).astype(np.float32)
+    start = time.perf_counter()
+    for query in queries:
+        for document, _ in index.similarity_search_by_vector_with_score(query, k=3):
+            assert document.page_content
+    latency = (time.perf_counter() - start) / SEARCHES
+    barrier.wait()
+    results.put((baseline, metrics.process_memory(), latency, index.mapped_bytes))
+    barrier.wait()
+
+
+def run(directory, workers, mmap):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(directory, mmap, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    barrier.wait()
+    reports = [results.get() for _ in processes]
+    barrier.wait()
+    for process in processes:
+        process.join()
+    return reports
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="shared-index-")
+    index = build_index(directory)
+    texts = ChunkTexts.from_texts(index.documents).nbytes
+    print(f"{CHUNKS} chunks: {index.nbytes / MiB:.0f} MiB vectors, {texts / MiB:.0f} MiB texts")
+    print("=" * 82)
+    print(f"{'mode':>8} {'workers':>8} {'total PSS MiB':>14} {'index PSS/worker':>17} "
+          f"{'USS/worker':>11} {'mapped MiB':>11} {'search ms':>10}")
+    print("-" * 82)
+    for mmap in (False, True):
+        for workers in WORKER_COUNTS:
+            reports = run(directory, workers, mmap)
+            total_pss = sum(memory["pss"] for _, memory, _, _ in reports)
+            added = statistics.mean(memory["pss"] - baseline["pss"] for baseline, memory, _, _ in reports)
+            uss = statistics.mean(memory["uss"] for _, memory, _, _ in reports)
+            latency = statistics.mean(latency for _, _, latency, _ in reports)
+            print(f"{'mmap' if mmap else 'private':>8} {workers:>8} {total_pss / MiB:>14.0f} "
+                  f"{added / MiB:>17.0f} {uss / MiB:>11.0f} {reports[0][3] / MiB:>11.0f} "
+                  f"{latency * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
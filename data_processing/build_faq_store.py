@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import time
+import uuid
+from backend import style_guide
+from backend.faq_store import FaqStore
+
+# Run from the repository root: python -m data_processing.build_faq_store
+# Answers canonical questions with the real pipeline (same environment
+# variables as the backend) and writes the FAQ store the backend serves
+# first-turn matches from. Upload the output directory to
+# s3://styleguidebot-lambda/faq_store/ for Lambda.
+QUESTIONS_PATH = "./data/faq_questions.txt"
+OUTPUT_DIR = style_guide.FAQ_STORE_LOCAL
+CONCURRENCY = 4
+
+
+def load_questions(path):
+    """Canonical questions, one per line; duplicates after normalization are dropped."""
+    questions = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            question = line.strip()
+            if question:
+                questions.setdefault(style_guide.normalize_query(question), question)
+    return list(questions.values())
+
+
+async def answer_question(question):
+    """Run one question through the configured pipeline in a throwaway thread."""
+    config = {"configurable": {"thread_id": f"faq-build-{uuid.uuid4()}"}}
+    try:
+        retrieved = await style_guide.run_pipeline(question, config)
+        await style_guide.flush_checkpoints(config)
+    finally:
+        await asyncio.to_thread(
+            style_guide.checkpointer_instance.delete_thread, config["configurable"]["thread_id"]
+        )
+    response = style_guide.clean_retrieved(retrieved)
+    return {
+        "question": question,
+        "answer": response["answer"],
+        "source_ids": [source["id"] for source in response["sources"] if source.get("id")],
+    }
+
+
+async def build_store(questions, concurrency=CONCURRENCY):
+    """Answer and embed questions against the loaded collection; return a FaqStore."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(question):
+        async with semaphore:
+            return await answer_question(question)
+
+    entries = await asyncio.gather(*(bounded(question) for question in questions))
+    # Entries citing no sources (refusals, clarifying questions) are not worth serving
+    entries = [entry for entry in entries if entry["source_ids"]]
+    vectors = await asyncio.to_thread(
+        style_guide.collection.embeddings.embed_queries, [entry["question"] for entry in entries]
+    )
+    return FaqStore(entries, FaqStore.normalize_vectors(vectors),
+                    collection_version=style_guide.collection_version)
+
+
+async def main(questions_path, output_dir, concurrency):
+    questions = load_questions(questions_path)
+    async with style_guide.lifespan_mechanism(style_guide.sub_application_style_guide):
+        # Never answer from an existing store while rebuilding it
+        style_guide.faq_store = None
+        start = time.perf_counter()
+        store = await build_store(questions, concurrency)
+    store.save(output_dir)
+    print(f"Answered {len(questions)} questions in {time.perf_counter() - start:.1f}s; "
+          f"wrote {len(store)} entries for collection {store.collection_version} to {output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the precomputed FAQ answer store.")
+    parser.add_argument("--questions", default=QUESTIONS_PATH,
+                        help="Text file with one canonical question per line.")
+    parser.add_argument("--output", default=OUTPUT_DIR, help="Directory to write the store to.")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="Questions answered at once.")
+    args = parser.parse_args()
+    asyncio.run(main(args.questions, args.output, args.concurrency))
@@ -1,13 +1,17 @@
 from openai import OpenAI
 from dotenv import load_dotenv
+import argparse
 import os
 import json
 import chromadb
 from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from backend.vector_index import SUPPORTED_DTYPES, VectorIndex
 
 MODEL = "text-embedding-3-small"
 ENV_LOC = ".env"
 COLLECTION_NAME = "style_guide_mos"
+CHROMA_PATH = "./data/chroma_db"
+COMPACT_INDEX_PATH = "./data/compact_index"
 
 
 def save_chroma(mos_dict):
@@ -17,7 +21,7 @@ def save_chroma(mos_dict):
         model_name=MODEL
     )
     # Create persistent chromadb
-    client = chromadb.PersistentClient(path="./data/chroma_db")
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
     # Create collection
     collection = client.get_or_create_collection(
         name=COLLECTION_NAME,
@@ -30,6 +34,25 @@ def save_chroma(mos_dict):
     )
     return "Data saved"
 
+
+# Export the Chroma vectors as a compact (reduced and/or quantized) index
+def save_compact_index(dimensions=None, dtype="float32", path=COMPACT_INDEX_PATH):
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    collection = client.get_collection(name=COLLECTION_NAME)
+    stored = collection.get(include=["embeddings", "documents", "metadatas"])
+    index = VectorIndex.from_embeddings(
+        ids=stored["ids"],
+        embeddings=stored["embeddings"],
+        documents=stored["documents"],
+        metadatas=stored["metadatas"],
+        dimensions=dimensions,
+        dtype=dtype
+    )
+    index.save(path)
+    return (f"Compact index saved to {path} "
+            f"({len(index)} chunks, {index.vectors.shape[1]} dims, {index.dtype}, "
+            f"{index.nbytes / 1024:.0f} KiB)")
+
 # Stringify shortcut list
 def prepare_metadata(metadata_dict):
     metadata_copy = metadata_dict.copy()
@@ -39,6 +62,16 @@ def prepare_metadata(metadata_dict):
 
 
 if __name__ == "__main__":
+    # Run from the repository root: python -m data_processing.create_vectordb
+    parser = argparse.ArgumentParser(description="Build the style guide vector store.")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Also write a compact index truncated to this many dimensions.")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default=None,
+                        help="Also write a compact index stored with this dtype.")
+    parser.add_argument("--export-only", action="store_true",
+                        help="Skip embedding; export the compact index from the existing Chroma DB.")
+    args = parser.parse_args()
+
     # Load environment variables
     load_dotenv(ENV_LOC)
     try:
@@ -52,7 +85,10 @@ if __name__ == "__main__":
             "content": [item["content"] for item in chunks_data],
             "metadata": [prepare_metadata(item["metadata"]) for item in chunks_data]
         }
-        print(save_chroma(mos_dictionary))
+        if not args.export_only:
+            print(save_chroma(mos_dictionary))
+        if args.export_only or args.dimensions or args.dtype:
+            print(save_compact_index(args.dimensions, args.dtype or "float32"))
 
     except Exception as e:
         print(f"\n❌ Failed to save data: {e}")
@@ -0,0 +1,100 @@
+import time
+import chromadb
+from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from dotenv import load_dotenv
+import os
+import numpy as np
+from backend.vector_index import VectorIndex
+
+# Run from the repository root: python -m data_processing.test_compact_index
+COLLECTION_NAME = "style_guide_mos"
+MODEL = "text-embedding-3-small"
+ENV_LOC = ".env"
+K = 3
+REPEATS = 50
+
+# (dimensions, dtype) variants compared against the full float32 vectors
+VARIANTS = [
+    (None, "float32"),
+    (None, "float16"),
+    (None, "int8"),
+    (1024, "float32"),
+    (512, "float32"),
+    (512, "float16"),
+    (512, "int8"),
+    (256, "int8"),
+]
+
+# Evaluation queries
+eval_queries = [
+    "Should I use the Oxford comma?",
+    "How do I format quotations?",
+    "When should I capitalize words?",
+    "Should there be spaces around an em dash?",
+    "How do I write dates in articles?",
+    "Should I use American or British spelling?",
+    "How should article titles be capitalized?",
+    "When do I use italics for titles of works?",
+    "How do I write numbers, as words or numerals?",
+    "Where does punctuation go relative to quotation marks?",
+    "Should I use contractions in articles?",
+    "How should I refer to people after first mention?",
+    "How do I use en dashes in ranges?",
+    "Can I use first-person pronouns in an article?",
+    "How should I format section headings?",
+    "What is the rule for gender-neutral language?",
+    "How do I abbreviate units of measurement?",
+    "When should I use bullet lists instead of prose?",
+    "How should foreign-language terms be formatted?",
+    "Should I use the serial comma in lists of three?",
+]
+
+# Load environment variables
+load_dotenv(ENV_LOC)
+
+# Create embedding function
+embedding_function = OpenAIEmbeddingFunction(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    model_name=MODEL
+)
+
+# Load the stored vectors
+client = chromadb.PersistentClient(path="./data/chroma_db")
+collection = client.get_collection(name=COLLECTION_NAME)
+stored = collection.get(include=["embeddings", "documents", "metadatas"])
+query_vectors = np.asarray(embedding_function(eval_queries), dtype=np.float32)
+
+print("Compact Index Comparison")
+print("=" * 80)
+print(f"Chunks: {len(stored['ids'])}, queries: {len(eval_queries)}, k={K}")
+
+baseline = None
+print(f"\n{'dims':>6} {'dtype':>8} {'memory KiB':>11} {'vs full':>8} "
+      f"{'latency ms':>11} {'recall@3':>9}")
+print("-" * 80)
+for dimensions, dtype in VARIANTS:
+    index = VectorIndex.from_embeddings(
+        ids=stored["ids"],
+        embeddings=stored["embeddings"],
+        documents=stored["documents"],
+        metadatas=stored["metadatas"],
+        dimensions=dimensions,
+        dtype=dtype
+    )
+    # Time single-query searches, as retrieve_context issues them
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for vector in query_vectors:
+            index.search_by_vectors([vector], K)
+    latency_ms = (time.perf_counter() - start) * 1000 / (REPEATS * len(query_vectors))
+
+    positions, _ = index.search_by_vectors(query_vectors, K)
+    if baseline is None:
+        baseline = (index.nbytes, positions)
+    recall = np.mean([
+        len(set(found) & set(expected)) / K
+        for found, expected in zip(positions, baseline[1])
+    ])
+    print(f"{dimensions or index.vectors.shape[1]:>6} {dtype:>8} "
+          f"{index.nbytes / 1024:>11.0f} {index.nbytes / baseline[0]:>7.1%} "
+          f"{latency_ms:>11.3f} {recall:>9.3f}")
@@ -1,5 +1,7 @@
+import base64
 import json
 import os
+import struct
 import boto3
 import requests
 from openai import OpenAI
@@ -8,6 +10,12 @@ from openai import OpenAI
 # Load OpenAI client
 openai_client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+# Compact wire formats: base64 of little-endian floats
+BINARY_ENCODINGS = {
+    'base64-float32': 'f',
+    'base64-float16': 'e',
+}
+
 
 # Verify reCAPTCHA function
 def verify_recaptcha(token: str, secret_key: str) -> dict:
@@ -31,6 +39,13 @@ def verify_recaptcha(token: str, secret_key: str) -> dict:
         return {'valid': False, 'error': str(e)}
 
 
+# Encode embedding as base64 little-endian floats
+def encode_embedding(embedding: list, encoding: str) -> str:
+    """Pack an embedding for the compact wire format."""
+    packed = struct.pack(f'<{len(embedding)}{BINARY_ENCODINGS[encoding]}', *embedding)
+    return base64.b64encode(packed).decode('ascii')
+
+
 def handler(event, context):
     """
     Handle both embedding and reCAPTCHA verification.
@@ -38,6 +53,12 @@ def handler(event, context):
     For embedding:
         Input: {"action": "embed", "query": "text"}
         Output: {"embedding": [...]}
+
+        With "encoding": "base64-float32" or "base64-float16" in the input:
+        Output: {"embedding_b64": "...", "encoding": "base64-float32"}
+
+        For a batch, pass "queries": ["text", ...] instead of "query":
+        Output: {"embeddings": [[...], ...]} or {"embeddings_b64": [...], "encoding": ...}
     
     For reCAPTCHA:
         Input: {"action": "verify_recaptcha", "token": "...", "secret_key": "..."}
@@ -55,6 +76,28 @@ def handler(event, context):
                 **result
             }
         
+        elif action == 'embed' and 'queries' in event:
+            # One OpenAI request for the whole batch
+            response = openai_client.embeddings.create(
+                input=event['queries'],
+                model="text-embedding-3-small"
+            )
+
+            embeddings = [item.embedding for item in response.data]
+
+            encoding = event.get('encoding', 'json')
+            if encoding in BINARY_ENCODINGS:
+                return {
+                    'statusCode': 200,
+                    'embeddings_b64': [encode_embedding(e, encoding) for e in embeddings],
+                    'encoding': encoding
+                }
+
+            return {
+                'statusCode': 200,
+                'embeddings': embeddings
+            }
+
         elif action == 'embed':
             query = event['query']
             
@@ -65,6 +108,14 @@ def handler(event, context):
             
             embedding = response.data[0].embedding
             
+            encoding = event.get('encoding', 'json')
+            if encoding in BINARY_ENCODINGS:
+                return {
+                    'statusCode': 200,
+                    'embedding_b64': encode_embedding(embedding, encoding),
+                    'encoding': encoding
+                }
+
             return {
                 'statusCode': 200,
                 'embedding': embedding
@@ -53,6 +53,7 @@ const handleSendMessage = async (userMessage) => {
       type: 'bot',
       content: response.answer,
       sources: response.sources,
+      version: response.collection_version,
       timestamp: new Date()
     };
     setMessages(prev => [...prev, botMsg]);
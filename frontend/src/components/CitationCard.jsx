@@ -1,14 +1,51 @@
 import { useState } from 'react';
+import { styleGuideAPI } from '../services/api';
 
-export default function CitationCard({ sources }) {
+export default function CitationCard({ sources, version }) {
   const [expandedIndex, setExpandedIndex] = useState(null);
+  const [contents, setContents] = useState({});
+  // 'idle' until first expand, then 'loading', 'loaded' or 'error'
+  const [status, setStatus] = useState('idle');
 
   if (!sources || sources.length === 0) {
     return null;
   }
 
+  // Sources carry chunk ids; fetch all of this card's content on first expand
+  const loadContents = async () => {
+    const ids = sources.filter((source) => source.id && !source.content).map((source) => source.id);
+    if (ids.length === 0 || status !== 'idle') {
+      return;
+    }
+    setStatus('loading');
+    try {
+      const chunks = await styleGuideAPI.getChunks(ids, version);
+      setContents(Object.fromEntries(
+        chunks.filter(Boolean).map((chunk) => [chunk.id, chunk.content])
+      ));
+      setStatus('loaded');
+    } catch {
+      setStatus('error');
+    }
+  };
+
   const toggleExpand = (index) => {
     setExpandedIndex(expandedIndex === index ? null : index);
+    loadContents();
+  };
+
+  const sourceContent = (source) => {
+    if (source.content) {
+      return source.content;
+    }
+    if (status === 'error') {
+      return 'Could not load this source.';
+    }
+    if (status === 'loaded') {
+      // The server omits ids it no longer has
+      return contents[source.id] ?? 'This source is no longer available.';
+    }
+    return 'Loading...';
   };
 
   return (
@@ -42,7 +79,7 @@ export default function CitationCard({ sources }) {
             {expandedIndex === index && (
               <div className="px-3 py-3 bg-white border-t border-purple-200">
                 <p className="text-xs text-gray-700 leading-relaxed whitespace-pre-wrap">
-                  {source.content}
+                  {sourceContent(source)}
                 </p>
               </div>
             )}
@@ -1,7 +1,7 @@
 import CitationCard from './CitationCard';
 import ReactMarkdown from 'react-markdown';
 
-export default function Message({ type, content, sources }) {
+export default function Message({ type, content, sources, version }) {
   const isUser = type === 'user';
 
   return (
@@ -30,7 +30,7 @@ export default function Message({ type, content, sources }) {
             </div>
           )}
         </div>
-        {!isUser && <CitationCard sources={sources} />}
+        {!isUser && <CitationCard sources={sources} version={version} />}
       </div>
 
       {/* User Avatar */}
@@ -29,6 +29,7 @@ export default function MessageList({ messages, loading }) {
           type={message.type}
           content={message.content}
           sources={message.sources}
+          version={message.version}
         />
       ))}
       
@@ -2,6 +2,12 @@ import axios from 'axios';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// Chunk content fetched for citations, keyed by collection version and chunk id.
+// Holds promises, so cards expanded together share one request per chunk;
+// a chunk the server does not return resolves to null.
+const chunkCache = new Map();
+const chunkKey = (id, version) => `${version}:${id}`;
+
 export const styleGuideAPI = {
   // Query the style guide
   query: async (query, sessionId, recaptchaToken) => {
@@ -18,6 +24,29 @@ export const styleGuideAPI = {
     }
   },
 
+  // Fetch source chunk content, only requesting chunks not already cached or in flight
+  getChunks: async (ids, version) => {
+    const missing = [...new Set(ids)].filter((id) => !chunkCache.has(chunkKey(id, version)));
+    if (missing.length > 0) {
+      const params = new URLSearchParams(missing.map((id) => ['ids', id]));
+      if (version) {
+        params.append('v', version);
+      }
+      const request = axios.get(`${API_BASE_URL}/bot/chunks?${params}`).then(
+        (response) => new Map(response.data.chunks.map((chunk) => [chunk.id, chunk]))
+      );
+      missing.forEach((id) => {
+        chunkCache.set(chunkKey(id, version), request.then((chunks) => chunks.get(id) ?? null));
+      });
+      // Failed fetches are not cached, so a later expand tries again
+      request.catch((error) => {
+        console.error('Chunk fetch error:', error);
+        missing.forEach((id) => chunkCache.delete(chunkKey(id, version)));
+      });
+    }
+    return Promise.all(ids.map((id) => chunkCache.get(chunkKey(id, version))));
+  },
+
   // Health check
   checkHealth: async () => {
     try {
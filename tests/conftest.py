@@ -0,0 +1,55 @@
+import asyncio
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import pytest
+
+# Bedrock and Lambda clients are built (never called) by the code under test
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+from backend import metrics, style_guide  # noqa: E402
+from backend.main import app  # noqa: E402
+from benchmarks.fakes import install_fake_backends  # noqa: E402
+
+# Module globals the tests reconfigure; restored after each test
+STATE = ("collection", "collection_version", "assistant", "checkpointer_instance",
+         "llm_with_tools", "router_thresholds", "pipeline_mode", "coalescing", "admission",
+         "request_deadline", "bedrock_clients", "llm_call_timeout", "faq_store",
+         "profile_settings", "verify_recaptcha", "get_daily_query_count",
+         "increment_daily_query_count")
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Fake embeddings, LLM and checkpointer behind /bot/query, with no limits.
+
+    Returns a function taking install_fake_backends' arguments.
+    """
+    for name in STATE:
+        monkeypatch.setattr(style_guide, name, getattr(style_guide, name))
+    monkeypatch.setattr(style_guide.limiter, "enabled", False)
+    style_guide.admission = None
+    style_guide.faq_store = None
+    style_guide.profile_settings = None
+    style_guide.verify_recaptcha = lambda token: True
+    style_guide.get_daily_query_count = lambda: 0
+    style_guide.increment_daily_query_count = lambda amount=1: None
+    metrics.reset()
+    return lambda **kwargs: install_fake_backends(style_guide, **kwargs)
+
+
+@pytest.fixture
+def post_queries():
+    """Function POSTing queries to /bot/query concurrently, each in a new session."""
+    async def run(queries):
+        # Enough worker threads that every query's blocking calls run at once
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(4 * len(queries)))
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/bot/query", json={
+                "query": query,
+                "session_id": f"test-{uuid.uuid4()}",
+                "recaptcha_token": "test",
+            }) for query in queries))
+    return lambda queries: asyncio.run(run(queries))
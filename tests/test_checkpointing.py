@@ -0,0 +1,93 @@
+import asyncio
+import time
+import httpx
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from backend import metrics, style_guide
+from backend.admission import AdmissionController
+from backend.checkpointing import WriteBehindCheckpointer
+from backend.main import app
+from benchmarks.fakes import SlowCheckpointer
+
+
+def config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def next_checkpoint(previous, step):
+    return create_checkpoint(previous or empty_checkpoint(), None, step)
+
+
+def cached(store, **kwargs):
+    return WriteBehindCheckpointer(store, latest_id=store.latest_checkpoint_id, **kwargs)
+
+
+def test_turn_without_lease_keeps_the_checkpoint_it_read():
+    metrics.reset()
+    store = SlowCheckpointer()
+    first = next_checkpoint(None, 0)
+    store.put(config("t"), first, {"step": 0}, {})
+    cache = cached(store, lease_seconds=0)
+
+    parent = cache.get_tuple(config("t"))
+    second = next_checkpoint(first, 1)
+    cache.put(parent.config, second, {"step": 1}, {})
+    # The checkpoint read at the start of the turn is still served from memory
+    assert cache.get_tuple(config("t", first["id"])).checkpoint["id"] == first["id"]
+    assert store.read_calls == 1
+
+    cache.flush("t")
+    stored = store.get_tuple(config("t"))
+    assert stored.checkpoint["id"] == second["id"]
+    assert stored.parent_config["configurable"]["checkpoint_id"] == first["id"]
+    assert "checkpoint.conflicts" not in metrics.snapshot()["counters"]
+
+
+def test_threads_beyond_max_threads_are_flushed_before_eviction():
+    store = SlowCheckpointer()
+    cache = cached(store, max_threads=2)
+    for i in range(3):
+        parent = cache.get_tuple(config(f"t{i}"))
+        assert parent is None
+        cache.put(config(f"t{i}"), next_checkpoint(None, 0), {"step": 0}, {})
+
+    # Turns that were never flushed are written rather than kept forever
+    assert len(cache._states) == 2
+    assert store.get_tuple(config("t0")) is not None
+
+
+async def query_and_wait_for_checkpoint(store, thread_id):
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/bot/query", json={
+            "query": "How should I format dashes?",
+            "session_id": thread_id,
+            "recaptcha_token": "test",
+        })
+    give_up = time.monotonic() + 3
+    while time.monotonic() < give_up:
+        stored = store.get_tuple(config(thread_id))
+        if stored and stored.checkpoint["channel_values"]["messages"][-1].type == "ai" \
+                and not stored.checkpoint["channel_values"]["messages"][-1].tool_calls:
+            return response.status_code, stored
+        await asyncio.sleep(0.05)
+    return response.status_code, store.get_tuple(config(thread_id))
+
+
+def test_turn_that_times_out_is_flushed_once_it_finishes(backends):
+    store = SlowCheckpointer()
+    cache = cached(store)
+    backends(llm_latency=0.4, checkpointer=cache)
+    style_guide.request_deadline = 0.6
+    style_guide.admission = AdmissionController(1, 1, 1.0)
+
+    status, stored = asyncio.run(query_and_wait_for_checkpoint(store, "timed-out"))
+
+    # The agent finished after the 504 and its turn still reached the store
+    assert status == 504
+    assert stored is not None
+    assert stored.checkpoint["channel_values"]["messages"][-1].type == "ai"
+    assert not stored.checkpoint["channel_values"]["messages"][-1].tool_calls
+    assert all(state.pending is None for state in cache._states.values())
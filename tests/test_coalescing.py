@@ -0,0 +1,20 @@
+import pytest
+from backend import style_guide
+
+BURST = 8
+# Identical after normalization
+QUERIES = ["How do I format quotations?", "how do I format  quotations", "How do I format quotations?!"]
+
+
+@pytest.mark.parametrize("enabled, expected_calls", [(True, 1), (False, BURST)])
+def test_concurrent_identical_queries(backends, post_queries, enabled, expected_calls):
+    embeddings, llm, _ = backends(embed_latency=0.1, llm_latency=0.3)
+    style_guide.pipeline_mode = "single_call"
+    style_guide.coalescing = enabled
+
+    responses = post_queries([QUERIES[i % len(QUERIES)] for i in range(BURST)])
+
+    assert [response.status_code for response in responses] == [200] * BURST
+    assert all(response.json()["answer"] and response.json()["sources"] for response in responses)
+    assert embeddings.calls == expected_calls
+    assert len(llm.calls) == expected_calls
@@ -0,0 +1,85 @@
+import asyncio
+import time
+import httpx
+import pytest
+from botocore.exceptions import ReadTimeoutError
+from langchain_aws import ChatBedrock
+from backend import style_guide
+from backend.admission import AdmissionController, BoundedClients
+from backend.main import app
+
+# A call that would take this long if its client let it
+SLOW_CALL = 5.0
+
+
+class SlowClient:
+    """boto3-like client whose calls hang until SLOW_CALL or its read timeout."""
+
+    def __init__(self, read_timeout):
+        self.read_timeout = read_timeout
+
+    def _hang(self):
+        time.sleep(min(SLOW_CALL, self.read_timeout))
+        raise ReadTimeoutError(endpoint_url="https://fake.amazonaws.com")
+
+    def invoke(self, **kwargs):
+        self._hang()
+
+    def invoke_model(self, **kwargs):
+        self._hang()
+
+
+async def query_and_wait_for_slot():
+    """Send one query; return (status, seconds to answer, seconds until its slot is free)."""
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        start = time.perf_counter()
+        response = await client.post("/bot/query", json={
+            "query": "How should I format dashes?",
+            "session_id": "test-deadline",
+            "recaptcha_token": "test",
+        })
+        answered = time.perf_counter() - start
+        while style_guide.admission.active:
+            await asyncio.sleep(0.01)
+        return response.status_code, answered, time.perf_counter() - start
+
+
+@pytest.mark.parametrize("mode", ["agent", "single_call"])
+def test_slow_bedrock_call_near_deadline_answers_504_in_time(backends, mode):
+    _, _, checkpointer = backends(embed_latency=0.2)
+    clients = []
+    style_guide.bedrock_clients = BoundedClients(
+        lambda timeout: clients.append(SlowClient(timeout)) or clients[-1], 25.0
+    )
+    llm = ChatBedrock(model_id="us.anthropic.claude-haiku-4-5-20251001-v1:0",
+                      region_name="us-east-1", model_kwargs={"max_tokens": 1024})
+    style_guide.build_assistant(llm, checkpointer)
+    style_guide.pipeline_mode = mode
+    style_guide.request_deadline = 0.9
+    style_guide.admission = AdmissionController(1, 1, 1.0)
+
+    status, answered, released = asyncio.run(query_and_wait_for_slot())
+
+    # The LLM call started with under 1 s left and got a client timing out with it
+    assert status == 504
+    assert len(clients) == 1 and clients[0].read_timeout <= 1.0
+    assert answered < 0.9 + 0.1
+    assert released < 0.9 + 0.25 + 0.1
+
+
+def test_slow_embedding_call_near_deadline_answers_504_in_time(backends):
+    backends()
+    embeddings = style_guide.LambdaEmbeddings(timeout=10)
+    embeddings.lambda_clients = BoundedClients(SlowClient, 10)
+    style_guide.collection.embedding_function = style_guide.CachedEmbeddings(embeddings)
+    style_guide.pipeline_mode = "single_call"
+    style_guide.request_deadline = 0.6
+    style_guide.admission = AdmissionController(1, 1, 1.0)
+
+    status, answered, released = asyncio.run(query_and_wait_for_slot())
+
+    assert status == 504
+    assert list(embeddings.lambda_clients._clients) == [0.75]
+    assert answered < 0.6 + 0.1
+    assert released < 0.6 + 0.25 + 0.1
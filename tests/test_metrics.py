@@ -0,0 +1,22 @@
+from fastapi.testclient import TestClient
+from backend import style_guide
+from backend.main import app
+from backend.profiling import sign_profile_request
+
+
+def test_metrics_are_not_served_without_a_secret(monkeypatch):
+    monkeypatch.setattr(style_guide, "metrics_secret", None)
+    assert TestClient(app).get("/bot/metrics").status_code == 404
+
+
+def test_metrics_require_a_signed_header(monkeypatch):
+    monkeypatch.setattr(style_guide, "metrics_secret", "test-secret")
+    client = TestClient(app)
+    assert client.get("/bot/metrics").status_code == 403
+    assert client.get("/bot/metrics", headers={
+        "X-Metrics": sign_profile_request("other-secret")
+    }).status_code == 403
+
+    response = client.get("/bot/metrics", headers={"X-Metrics": sign_profile_request("test-secret")})
+    assert response.status_code == 200
+    assert {"memory", "counters", "timings"} <= set(response.json())
@@ -0,0 +1,19 @@
+from backend import metrics, style_guide
+
+
+def test_routed_turn_searches_once(backends, post_queries, monkeypatch):
+    _, llm, _ = backends(routing=True)
+    style_guide.pipeline_mode = "agent"
+    searches = []
+    search = style_guide.collection.similarity_search_with_score
+    monkeypatch.setattr(style_guide.collection, "similarity_search_with_score",
+                        lambda *args: searches.append(args) or search(*args))
+
+    [response] = post_queries(["Should there be spaces around an em dash?"])
+
+    # Routing scores the turn once; retrieve_context reuses its search
+    assert response.status_code == 200
+    assert len(searches) == 1
+    counters = metrics.snapshot()["counters"]
+    assert counters["router.retrieval.reused"] == 1
+    assert counters.get("router.fast", 0) + counters.get("router.large", 0) == 1